@@ -0,0 +1,225 @@
+import json
+import math
+import time
+import faiss
+import numpy as np
+import pandas as pd
+
+INDEX_TYPES = ["flat", "ivf_flat", "ivf_pq", "hnsw", "opq_ivf_pq"]
+TRAIN_SAMPLE_SIZE = 50_000
+OPQ_MIN_TRAIN = 256  # OPQ trains its own 8-bit PQ, i.e. 256 centroids, whatever nbits the IVF-PQ uses
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+SEED = 42
+
+# Parameter grid explored by sweep_index_configs(); "auto" nlist is resolved per corpus size
+SWEEP_GRID = {
+    "flat": [{}],
+    "ivf_flat": [{"nlist": nlist, "nprobe": nprobe} for nlist in ["auto"] for nprobe in [1, 4, 16, 64]],
+    "ivf_pq": [{"nlist": "auto", "nprobe": nprobe, "m": m} for m in [8, 16, 32] for nprobe in [4, 16, 64]],
+    "hnsw": [{"hnsw_m": hnsw_m, "ef_search": ef} for hnsw_m in [16, 32] for ef in [16, 64, 128]],
+    "opq_ivf_pq": [{"nlist": "auto", "nprobe": nprobe, "m": m} for m in [16, 32] for nprobe in [16, 64]],
+}
+
+
+def default_nlist(n_vectors):
+    """About 4 * sqrt(n) lists, capped so every centroid gets ~39 training points."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def default_pq_m(dim):
+    """Largest common sub-quantizer count that divides dim with at least 8 dims per sub-vector."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 8:
+            return m
+    return 1
+
+
+def pq_nbits(n_train):
+    """8 bits per code when there is enough training data, fewer for small corpora."""
+    return max(1, min(8, int(math.log2(max(n_train, 2)))))
+
+
+def factory_string(index_type, dim, n_vectors, nlist="auto", m=None, hnsw_m=32, **_):
+    """
+    Translates an index type and its build parameters into a FAISS index_factory string.
+
+    Args:
+        index_type (str): One of INDEX_TYPES
+        dim (int): Embedding dimensionality
+        n_vectors (int): Number of vectors the index will be trained on
+        nlist (int | str): Number of IVF lists, "auto" for default_nlist(n_vectors)
+        m (int | None): PQ sub-quantizers, None for default_pq_m(dim)
+        hnsw_m (int): HNSW graph degree
+
+    Returns:
+        str: The factory string, e.g. "IVF64,PQ16x8"; opq_ivf_pq falls back to plain IVF-PQ
+            when there are fewer than OPQ_MIN_TRAIN training vectors
+    """
+    if nlist == "auto":
+        nlist = default_nlist(n_vectors)
+    if m is None or dim % m != 0:
+        m = default_pq_m(dim)
+    nbits = pq_nbits(min(n_vectors, TRAIN_SAMPLE_SIZE))
+
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if index_type == "opq_ivf_pq":
+        if min(n_vectors, TRAIN_SAMPLE_SIZE) < OPQ_MIN_TRAIN:
+            return f"IVF{nlist},PQ{m}x{nbits}"
+        return f"OPQ{m},IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unknown index type: {index_type}. Choose from {INDEX_TYPES}")
+
+
+def apply_search_params(index, nprobe=None, ef_search=None, **_):
+    """Sets query-time parameters (IVF nprobe, HNSW efSearch) where the index supports them."""
+    params = faiss.ParameterSpace()
+    if nprobe is not None:
+        try:
+            params.set_index_parameter(index, "nprobe", nprobe)
+        except RuntimeError:
+            pass
+    if ef_search is not None:
+        try:
+            params.set_index_parameter(index, "efSearch", ef_search)
+        except RuntimeError:
+            pass
+    return index
+
+
+def make_index(embeddings, index_type="flat", ids=None, **params):
+    """
+    Builds, trains (on a random sample) and fills a FAISS index.
+
+    Args:
+        embeddings (np.ndarray): A float32 array of shape (n_samples, dim)
+        index_type (str): One of INDEX_TYPES
+        ids (np.ndarray | None): int64 ids per row; when given the index is wrapped in an
+            IndexIDMap2 and searches return these ids instead of row positions
+        **params: Build and search parameters (nlist, m, hnsw_m, nprobe, ef_search)
+
+    Returns:
+        faiss.Index: The populated index with search parameters applied
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+    if index_type == "opq_ivf_pq" and n < OPQ_MIN_TRAIN:
+        print(f"⚠️ OPQ needs at least {OPQ_MIN_TRAIN} training vectors, got {n}: building plain IVF-PQ instead")
+    index = faiss.index_factory(dim, factory_string(index_type, dim, n, **params))
+
+    if not index.is_trained:
+        rng = np.random.default_rng(SEED)
+        sample = embeddings
+        if n > TRAIN_SAMPLE_SIZE:
+            sample = embeddings[rng.choice(n, TRAIN_SAMPLE_SIZE, replace=False)]
+        index.train(sample)
+
+    index = add_vectors(index, embeddings, ids)
+    return apply_search_params(index, **params)
+
+
+def add_vectors(index, embeddings, ids=None):
+    """Adds embeddings to a trained index, wrapping it in an IndexIDMap2 first when ids are given."""
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    else:
+        index.add(embeddings)
+    return index
+
+
+def save_index(index, path, index_type="flat", **params):
+    """Writes the index and a JSON sidecar with its type and search parameters."""
+    faiss.write_index(index, path)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"index_type": index_type, **params}, f, indent=2)
+
+
+def read_index_mmap(path):
+    """Reads an index with its vectors memory-mapped, falling back to a full read for index types without mmap support."""
+    try:
+        return faiss.read_index(path, MMAP_FLAGS)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def index_spec(path):
+    """Type and parameters an index was saved with (its save_index sidecar), or None if there is none."""
+    try:
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_index(path, mmap=True):
+    """Reads an index written by save_index and re-applies its search parameters."""
+    index = read_index_mmap(path) if mmap else faiss.read_index(path)
+    spec = index_spec(path)
+    return index if spec is None else apply_search_params(index, **spec)
+
+
+def index_size_bytes(index):
+    """Serialized size of the index in bytes."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall_vs_baseline(I, I_ref, k):
+    """Fraction of the exact top-k neighbours that the approximate index also returns."""
+    overlap = sum(len(set(a[:k]) & set(b[:k]) - {-1}) for a, b in zip(I, I_ref))
+    return overlap / (len(I_ref) * k)
+
+
+def sweep_index_configs(embeddings, queries, k=5, grid=SWEEP_GRID):
+    """
+    Builds every index configuration in grid and compares it to the exact Flat baseline.
+
+    A configuration that fails to build or search is reported and skipped, so the others are kept.
+
+    Args:
+        embeddings (np.ndarray): Corpus vectors of shape (n_samples, dim)
+        queries (np.ndarray): Query vectors of shape (n_queries, dim)
+        k (int): Number of neighbours used for recall@k
+        grid (dict[str, list[dict]]): Parameter settings per index type
+
+    Returns:
+        pd.DataFrame: One row per configuration with build time, index size,
+            per-query latency and recall@k relative to Flat
+    """
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    baseline = make_index(embeddings, "flat")
+    _, I_ref = baseline.search(queries, k)
+
+    rows = []
+    for index_type, settings in grid.items():
+        for params in settings:
+            try:
+                start = time.perf_counter()
+                index = make_index(embeddings, index_type, **params)
+                build_s = time.perf_counter() - start
+
+                start = time.perf_counter()
+                _, I = index.search(queries, k)
+                search_s = time.perf_counter() - start
+            except RuntimeError as e:
+                print(f"⚠️ Skipping {index_type} {params}: {str(e).splitlines()[0]}")
+                continue
+
+            rows.append({
+                "index_type": index_type,
+                "factory": factory_string(index_type, embeddings.shape[1], len(embeddings), **params),
+                **{p: params.get(p) for p in ["nlist", "nprobe", "m", "hnsw_m", "ef_search"]},
+                "build_s": build_s,
+                "index_mb": index_size_bytes(index) / 1e6,
+                "query_ms": 1000 * search_s / len(queries),
+                f"recall@{k}": recall_vs_baseline(I, I_ref, k),
+            })
+            print(f"  {rows[-1]['factory']:<24} recall@{k}={rows[-1][f'recall@{k}']:.3f} "
+                  f"query={rows[-1]['query_ms']:.3f}ms")
+
+    return pd.DataFrame(rows)
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+import numpy as np
+from tqdm import tqdm
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket.
+
+    Holds up to `capacity` tokens and refills at `rate` tokens per second.
+    `acquire(cost)` waits until `cost` tokens are available and takes them.
+
+    Args:
+        rate (float): Refill rate in tokens per second
+        capacity (float | None): Bucket size, defaults to one second worth of tokens
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, limit):
+        """Builds a bucket from a per-minute limit, or returns None if no limit is set."""
+        if not limit:
+            return None
+        return cls(limit / 60.0, capacity=limit / 60.0 * 5)
+
+    async def acquire(self, cost=1.0):
+        # Requests larger than the bucket are allowed through once it is full
+        cost = min(cost, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+
+
+def estimate_tokens(texts):
+    """Rough token count used for rate limiting (about 4 characters per token)."""
+    return sum(len(t) for t in texts) // 4 + len(texts)
+
+
+def is_retryable(exc):
+    """Returns True for rate-limit (429), server (5xx) and transient network errors."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError)) or "Connection" in type(exc).__name__ \
+        or "Timeout" in type(exc).__name__
+
+
+async def call_with_backoff(fn, *args, max_retries=6, base_delay=1.0, max_delay=60.0):
+    """
+    Awaits fn(*args), retrying retryable errors with exponential backoff and full jitter.
+
+    Args:
+        fn (callable): Coroutine function to call
+        max_retries (int): Number of retries before the last error is raised
+        base_delay (float): Delay before the first retry, in seconds
+        max_delay (float): Upper bound for a single delay, in seconds
+
+    Returns:
+        Any: The result of fn(*args)
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn(*args)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"⚠️ {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def embed_batches_async(texts, embed_batch, batch_size=32, concurrency=4, request_limiter=None,
+                              token_limiter=None, max_retries=6, desc="Embedding", show_progress=True):
+    """
+    Embeds texts in batches with several batches in flight at once.
+
+    Args:
+        texts (list[str]): Texts to embed
+        embed_batch (callable): Coroutine function mapping list[str] to a list of vectors
+        batch_size (int): Number of texts per request
+        concurrency (int): Maximum number of requests in flight
+        request_limiter (TokenBucket | None): Limits requests per second
+        token_limiter (TokenBucket | None): Limits estimated input tokens per second
+        max_retries (int): Retries per batch on 429/5xx errors
+        desc (str): Progress bar label
+        show_progress (bool): Show the progress bar
+
+    Returns:
+        np.ndarray: A float32 array of shape (len(texts), embedding_dim) in the order of texts
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = tqdm(total=len(batches), desc=desc, disable=not show_progress)
+
+    async def run(i, batch):
+        async with semaphore:
+            if request_limiter is not None:
+                await request_limiter.acquire(1)
+            if token_limiter is not None:
+                await token_limiter.acquire(estimate_tokens(batch))
+            results[i] = await call_with_backoff(embed_batch, batch, max_retries=max_retries)
+            progress.update(1)
+
+    try:
+        await asyncio.gather(*(run(i, b) for i, b in enumerate(batches)))
+    finally:
+        progress.close()
+
+    embeddings = [vec for batch_result in results for vec in batch_result]
+    return np.array(embeddings, dtype="float32")
+
+
+def embed_concurrently(texts, embed_batch, **kwargs):
+    """Synchronous wrapper around embed_batches_async for use from scripts."""
+    return asyncio.run(embed_batches_async(list(texts), embed_batch, **kwargs))
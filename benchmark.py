@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+import faiss
+import numpy as np
+from embedders import EMBEDDERS, DEFAULT_EMBEDDERS, BATCH_SIZE, get_embedder
+from ann_indexes import INDEX_TYPES, SEED, make_index, index_size_bytes
+from async_embedding import estimate_tokens
+from chunk_store import iter_chunks
+from evaluate_models import GROUND_PATH, TOP_K, QUERY_BATCH_SIZE, load_questions
+
+CHUNKS_PATH = "data/acme_recursive_chunks_char.json"
+OUTPUT_PATH = "benchmark_results.json"
+EMBED_SAMPLE = 256        # texts embedded (bypassing the cache) to measure throughput
+WARMUP_TEXTS = 8          # texts encoded by local models before timing
+LATENCY_QUERIES = 500     # single-query searches timed per index
+BATCH_QUERIES = 64        # queries per batch search
+BATCH_REPEATS = 20        # batch searches timed per index
+REGRESSION_THRESHOLD = 0.2  # flag metrics that got more than 20% worse than the baseline
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles_ms(seconds, prefix):
+    """Latency percentiles in milliseconds, keyed e.g. "single_p95_ms"."""
+    values = 1000 * np.percentile(seconds, PERCENTILES)
+    return {f"{prefix}_p{p}_ms": float(v) for p, v in zip(PERCENTILES, values)}
+
+
+def benchmark_embedding(embedder, texts, batch_size=BATCH_SIZE):
+    """
+    Measures embedding throughput on texts, bypassing the embedding cache.
+
+    Tokens are estimated (about 4 characters per token), the same count used for rate limiting.
+    Local models are loaded (and exported to ONNX if needed) and run once before timing starts,
+    so model load time is not counted as encoding time.
+
+    Returns:
+        tuple[dict, np.ndarray]: Throughput record and the embeddings
+    """
+    if hasattr(embedder, "st_model"):
+        embedder.st_model
+        embedder.embed_uncached(texts[:WARMUP_TEXTS], batch_size)
+    start = time.perf_counter()
+    embeddings = np.asarray(embedder.embed_uncached(texts, batch_size), dtype="float32")
+    seconds = time.perf_counter() - start
+    return {
+        "embed_texts": len(texts),
+        "embed_seconds": seconds,
+        "texts_per_s": len(texts) / seconds,
+        "tokens_per_s": estimate_tokens(texts) / seconds,
+    }, embeddings
+
+
+def scale_corpus(embeddings, scale):
+    """
+    Tiles the corpus scale times with small random perturbations, so index build and
+    search can be measured at a larger size than the document provides.
+    """
+    if scale <= 1:
+        return embeddings
+    rng = np.random.default_rng(SEED)
+    tiled = np.tile(embeddings, (scale, 1))
+    tiled += rng.normal(scale=0.01 * embeddings.std(), size=tiled.shape).astype("float32")
+    return tiled
+
+
+def benchmark_index(embeddings, queries, index_type, k=TOP_K):
+    """
+    Measures build time, serialized size and single-query / batch search latency of one index type.
+
+    Args:
+        embeddings (np.ndarray): Corpus vectors of shape (n_samples, dim)
+        queries (np.ndarray): Query vectors, cycled as needed
+        index_type (str): One of INDEX_TYPES
+        k (int): Neighbours per search
+
+    Returns:
+        dict: Benchmark record with "build_seconds", "index_bytes", "bytes_per_vector",
+            single-query and batch latency percentiles and "batch_qps"
+    """
+    start = time.perf_counter()
+    index = make_index(embeddings, index_type)
+    build_seconds = time.perf_counter() - start
+    size = index_size_bytes(index)
+
+    # Warm-up so the first timed search does not pay for lazy allocations
+    index.search(queries[:1], k)
+
+    single = []
+    for i in range(LATENCY_QUERIES):
+        q = queries[i % len(queries)][None, :]
+        start = time.perf_counter()
+        index.search(q, k)
+        single.append(time.perf_counter() - start)
+
+    batch_size = min(BATCH_QUERIES, len(queries))
+    batch = []
+    for i in range(BATCH_REPEATS):
+        offset = (i * batch_size) % len(queries)
+        Q = np.roll(queries, -offset, axis=0)[:batch_size]
+        start = time.perf_counter()
+        index.search(Q, k)
+        batch.append(time.perf_counter() - start)
+
+    return {
+        "index_type": index_type,
+        "n_vectors": len(embeddings),
+        "build_seconds": build_seconds,
+        "index_bytes": size,
+        "bytes_per_vector": size / len(embeddings),
+        **percentiles_ms(single, "single"),
+        **percentiles_ms(batch, "batch"),
+        "batch_size": batch_size,
+        "batch_qps": batch_size * len(batch) / sum(batch),
+    }
+
+
+def run_benchmarks(models, index_types, chunks_path=CHUNKS_PATH, scale=1):
+    """
+    Benchmarks every model and index type.
+
+    Returns:
+        list[dict]: One record per (model, index_type); embedding throughput is repeated on each.
+            Index types that fail to build get an "error" field instead of index metrics
+    """
+    texts = [c["content"] for c in iter_chunks(chunks_path, skip_empty=True)]
+    question_texts = [row["question"] for row, _ in load_questions(GROUND_PATH)]
+    rng = np.random.default_rng(SEED)
+
+    records = []
+    for model_name in models:
+        embedder = get_embedder(model_name)
+        sample = [texts[i] for i in rng.choice(len(texts), min(EMBED_SAMPLE, len(texts)), replace=False)]
+        print(f"\nBenchmarking {model_name.upper()} embedding on {len(sample)} texts...")
+        throughput, _ = benchmark_embedding(embedder, sample)
+        print(f"  {throughput['texts_per_s']:.1f} texts/s, {throughput['tokens_per_s']:.0f} tokens/s")
+
+        # The corpus and questions themselves are served by the cache
+        corpus = scale_corpus(np.ascontiguousarray(embedder.embed(texts), dtype="float32"), scale)
+        queries = np.ascontiguousarray(embedder.embed(question_texts, batch_size=QUERY_BATCH_SIZE), dtype="float32")
+        # Few labelled questions: pad the query set with corpus vectors
+        extra = corpus[rng.choice(len(corpus), max(BATCH_QUERIES - len(queries), 0), replace=False)]
+        queries = np.ascontiguousarray(np.vstack([queries, extra]))
+
+        for index_type in index_types:
+            try:
+                record = {"model": model_name, "dim": corpus.shape[1], **throughput,
+                          **benchmark_index(corpus, queries, index_type)}
+            except RuntimeError as e:
+                # Recorded rather than raised, so one untrainable index type does not lose the other results
+                error = str(e).splitlines()[0]
+                records.append({"model": model_name, "dim": corpus.shape[1], **throughput,
+                                "index_type": index_type, "error": error})
+                print(f"  ⚠️ {index_type:<12} failed: {error}")
+                continue
+            records.append(record)
+            print(f"  {index_type:<12} build {record['build_seconds']:.3f}s, {record['index_bytes'] / 1e6:.2f} MB, "
+                  f"single p50/p99 {record['single_p50_ms']:.3f}/{record['single_p99_ms']:.3f} ms, "
+                  f"batch {record['batch_qps']:.0f} q/s")
+    return records
+
+
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss": faiss.__version__,
+        "numpy": np.__version__,
+        "faiss_threads": faiss.omp_get_max_threads(),
+    }
+
+
+def compare_to_baseline(records, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints metrics that regressed by more than threshold relative to an earlier results file.
+
+    Returns:
+        list[str]: Descriptions of the regressions found
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["model"], r["index_type"]): r for r in json.load(f)["results"]}
+
+    higher_is_better = ["texts_per_s", "tokens_per_s", "batch_qps"]
+    lower_is_better = ["build_seconds", "bytes_per_vector"] + [f"{kind}_p{p}_ms" for kind in ["single", "batch"]
+                                                               for p in PERCENTILES]
+    regressions = []
+    seen_models = set()
+    for r in records:
+        old = baseline.get((r["model"], r["index_type"]))
+        if old is None:
+            continue
+        for metric in higher_is_better + lower_is_better:
+            if not old.get(metric) or metric not in r:
+                continue
+            # Embedding throughput is repeated on every index record of a model; report it once
+            if metric in ("texts_per_s", "tokens_per_s") and r["model"] in seen_models:
+                continue
+            change = (r[metric] - old[metric]) / old[metric]
+            if (metric in higher_is_better and change < -threshold) or (metric in lower_is_better and change > threshold):
+                regressions.append(f"{r['model']}/{r['index_type']} {metric}: {old[metric]:.4g} -> {r[metric]:.4g} "
+                                   f"({change:+.0%})")
+        seen_models.add(r["model"])
+    for line in regressions:
+        print(f"⚠️ Regression: {line}")
+    if not regressions:
+        print(f"✅ No regressions beyond {threshold:.0%} against {baseline_path}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput, index build and search latency.")
+    parser.add_argument("--chunks", default=CHUNKS_PATH, help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDERS), default=DEFAULT_EMBEDDERS,
+                        help="Embedding providers to benchmark (default: openai, cohere, open_source)")
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=INDEX_TYPES)
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Replicate the corpus vectors this many times for index benchmarks")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--baseline", default=None, help="Earlier results file to check for regressions")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    records = run_benchmarks(args.models, args.index_types, args.chunks, args.scale)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "scale": args.scale, "results": records}, f, indent=2)
+    print(f"\nBenchmark results saved to {args.output}")
+
+    if args.baseline:
+        compare_to_baseline(records, args.baseline)
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+K1 = 1.5
+B = 0.75
+RRF_K = 60  # reciprocal-rank fusion constant
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed corpus, stored as a CSR term -> document matrix of precomputed weights.
+
+    Row t of the matrix (doc_ids[indptr[t]:indptr[t + 1]], weights[...]) holds
+    idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len)) for every document containing t,
+    so scoring a query is a sparse matrix-vector product: the posting slices of its terms are
+    concatenated and summed per document with np.bincount, without a Python loop over documents.
+
+    Search returns the same labels as the FAISS indices (chunk_int_id), so results can be
+    scored and fused exactly like dense ones.
+
+    Args:
+        vocab (dict[str, int]): Term -> row of the CSR matrix
+        indptr (np.ndarray): int64 row pointers, length len(vocab) + 1
+        doc_ids (np.ndarray): int32 document row of each non-zero
+        weights (np.ndarray): float32 BM25 weight of each non-zero
+        labels (np.ndarray): int64 label returned for each document row
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, weights, labels):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.labels = labels
+
+    @classmethod
+    def build(cls, texts, labels=None, k1=K1, b=B):
+        """
+        Builds the index from chunk texts.
+
+        Args:
+            texts (list[str]): Documents in row order
+            labels (np.ndarray | None): int64 label per row, defaults to the row position
+            k1 (float): Term-frequency saturation
+            b (float): Length normalization
+
+        Returns:
+            BM25Index: The built index
+        """
+        vocab = {}
+        term_ids, doc_rows = [], []
+        doc_lengths = np.zeros(len(texts), dtype="float32")
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[row] = len(tokens)
+            term_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+            doc_rows.extend([row] * len(tokens))
+
+        n_docs = max(len(texts), 1)
+        # Term frequencies: count each (term, doc) pair once, sorted by term then document
+        keys, tf = np.unique(np.array(term_ids, dtype="int64") * n_docs + np.array(doc_rows, dtype="int64"),
+                             return_counts=True)
+        terms = keys // n_docs
+        doc_ids = (keys % n_docs).astype("int32")
+
+        df = np.bincount(terms, minlength=len(vocab))
+        idf = np.log1p((len(texts) - df + 0.5) / (df + 0.5))
+        avg_len = doc_lengths.mean() if len(texts) else 1.0
+        norm = k1 * (1 - b + b * doc_lengths[doc_ids] / avg_len)
+        weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype("float32")
+
+        indptr = np.zeros(len(vocab) + 1, dtype="int64")
+        indptr[1:] = np.cumsum(df)
+        if labels is None:
+            labels = np.arange(len(texts), dtype="int64")
+        return cls(vocab, indptr, doc_ids, weights, np.asarray(labels, dtype="int64"))
+
+    def scores(self, query):
+        """BM25 score of every document for one query, shape (n_docs,)."""
+        rows = [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+        if not rows:
+            return np.zeros(len(self.labels), dtype="float32")
+        slices = [np.arange(self.indptr[r], self.indptr[r + 1]) for r in rows]
+        nz = np.concatenate(slices)
+        return np.bincount(self.doc_ids[nz], weights=self.weights[nz], minlength=len(self.labels))
+
+    def search(self, queries, k):
+        """
+        Top-k documents per query, mirroring faiss.Index.search.
+
+        Documents sharing no term with the query are not returned; their slots hold label -1.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Scores and labels of shape (len(queries), k)
+        """
+        D = np.zeros((len(queries), k), dtype="float32")
+        I = np.full((len(queries), k), -1, dtype="int64")
+        for q, query in enumerate(queries):
+            s = self.scores(query)
+            top = np.argsort(-s, kind="stable")[:k]
+            top = top[s[top] > 0]
+            D[q, :len(top)] = s[top]
+            I[q, :len(top)] = self.labels[top]
+        return D, I
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ["indptr", "doc_ids", "weights", "labels"]:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        arrays = [np.load(os.path.join(path, f"{name}.npy")) for name in ["indptr", "doc_ids", "weights", "labels"]]
+        return cls(vocab, *arrays)
+
+
+def rrf_fuse(result_lists, k, rrf_k=RRF_K):
+    """
+    Reciprocal-rank fusion of several ranked label matrices.
+
+    Each label scores sum(1 / (rrf_k + rank)) over the lists it appears in; -1 slots are ignored.
+
+    Args:
+        result_lists (list[np.ndarray]): Label matrices of shape (n_queries, depth_i) from search
+        k (int): Number of fused results per query
+        rrf_k (int): Fusion constant, larger values flatten the contribution of top ranks
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Fused scores and labels of shape (n_queries, k)
+    """
+    labels = np.hstack(result_lists)
+    ranks = np.hstack([np.broadcast_to(np.arange(1, I.shape[1] + 1), I.shape) for I in result_lists])
+    contributions = np.where(labels >= 0, 1.0 / (rrf_k + ranks), 0.0)
+
+    D = np.zeros((len(labels), k), dtype="float32")
+    I = np.full((len(labels), k), -1, dtype="int64")
+    for q in range(len(labels)):
+        valid = labels[q] >= 0
+        unique, inverse = np.unique(labels[q][valid], return_inverse=True)
+        fused = np.bincount(inverse, weights=contributions[q][valid], minlength=len(unique))
+        top = np.argsort(-fused, kind="stable")[:k]
+        D[q, :len(top)] = fused[top]
+        I[q, :len(top)] = unique[top]
+    return D, I
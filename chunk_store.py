@@ -0,0 +1,354 @@
+import hashlib
+import json
+import mmap
+import os
+import numpy as np
+
+
+def chunk_int_id(chunk_id):
+    """Stable non-negative int64 FAISS id for a chunk id (first 63 bits of its BLAKE2b digest)."""
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+STRING_KINDS = ("str", "json")
+
+
+def iter_chunks(path, skip_empty=False):
+    """
+    Yields chunks from a chunk file without materializing the whole list when possible.
+
+    Newline-delimited JSON (.jsonl) is streamed line by line; JSON arrays (.json) are parsed in one go;
+    a chunk store directory (see build_text_store) is read row by row.
+
+    Args:
+        path (str): Chunk file produced by the chunking scripts, or a chunk store directory
+        skip_empty (bool): Skip chunks whose content is blank
+    """
+    if os.path.isdir(path):
+        store = ChunkTextStore(path)
+        try:
+            for c in store.iter_chunks():
+                if not skip_empty or c["content"].strip() != "":
+                    yield c
+        finally:
+            store.close()
+        return
+
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            chunks = (json.loads(line) for line in f if line.strip())
+            for c in chunks:
+                if not skip_empty or c["content"].strip() != "":
+                    yield c
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for c in data:
+        if not skip_empty or c["content"].strip() != "":
+            yield c
+
+
+def write_blob_column(store_dir, name, values):
+    """Writes strings (None allowed) as <name>.bin plus <name>.offsets.npy; None is stored as offset -1."""
+    offsets = np.zeros(len(values) + 1, dtype="int64")
+    nulls = np.zeros(len(values), dtype=bool)
+    with open(os.path.join(store_dir, f"{name}.bin"), "wb") as f:
+        pos = 0
+        for i, v in enumerate(values):
+            if v is None:
+                nulls[i] = True
+            else:
+                b = v.encode("utf-8")
+                f.write(b)
+                pos += len(b)
+            offsets[i + 1] = pos
+    np.save(os.path.join(store_dir, f"{name}.offsets.npy"), offsets)
+    if nulls.any():
+        np.save(os.path.join(store_dir, f"{name}.nulls.npy"), nulls)
+
+
+def column_kind(values):
+    """Storage kind of a metadata column: "int", "float", "str" or "json" (anything else, JSON-encoded)."""
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    return "json"
+
+
+def hash_slots(labels):
+    """
+    Open-addressing table mapping an int64 label to its row in O(1).
+
+    The table has a power-of-two size of at least twice the number of rows; slot
+    (label & mask) holds the row, or the next free slot on collision (linear probing).
+    """
+    size = 1 << max(1, (2 * len(labels) - 1).bit_length())
+    mask = size - 1
+    slots = [-1] * size
+    for row, label in enumerate(labels):
+        i = label & mask
+        while slots[i] != -1:
+            i = (i + 1) & mask
+        slots[i] = row
+    return np.array(slots, dtype="int64")
+
+
+def build_text_store(chunks, store_dir):
+    """
+    Writes chunks as a columnar store whose columns can be read independently and lazily.
+
+    Layout:
+        ids.npy            chunk ids in row order (the row -> chunk_id table)
+        labels.npy         int64 FAISS id (chunk_int_id) of each row
+        slots.npy          hash table label -> row (see hash_slots), for O(1) lookup by chunk id or label
+        texts.bin          UTF-8 chunk texts, concatenated; byte offsets in texts.offsets.npy (length n + 1)
+        meta.<key>.npy     int and float metadata columns
+        meta.<key>.bin     string and JSON-encoded metadata columns, with byte offsets in .offsets.npy
+        meta.<key>.nulls.npy  rows that lack the key, only written for columns with missing values
+        columns.json       row count and the kind of every metadata column (written last)
+
+    Args:
+        chunks (Iterable[dict]): Chunks with "metadata.chunk_id" and "content", in row order;
+            consumed once, so a generator from iter_chunks is streamed straight to disk
+        store_dir (str): Directory to write the store to
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    marker = os.path.join(store_dir, "columns.json")
+    if os.path.exists(marker):
+        os.remove(marker)
+    # Column files are only written when needed (e.g. nulls masks), so stale ones would outlive a rebuild
+    for name in os.listdir(store_dir):
+        if name.startswith("meta."):
+            os.remove(os.path.join(store_dir, name))
+
+    ids = []
+    lengths = []
+    metadata = {}
+    with open(os.path.join(store_dir, "texts.bin"), "wb") as f:
+        for row, c in enumerate(chunks):
+            b = c["content"].encode("utf-8")
+            f.write(b)
+            ids.append(c["metadata"]["chunk_id"])
+            lengths.append(len(b))
+            for key, value in c["metadata"].items():
+                if key != "chunk_id":
+                    metadata.setdefault(key, [None] * row)
+            for key, values in metadata.items():
+                values.append(c["metadata"].get(key))
+
+    offsets = np.zeros(len(lengths) + 1, dtype="int64")
+    offsets[1:] = np.cumsum(lengths)
+    np.save(os.path.join(store_dir, "texts.offsets.npy"), offsets)
+    np.save(os.path.join(store_dir, "ids.npy"), np.array(ids, dtype=f"<U{max([len(i) for i in ids] + [1])}"))
+
+    labels = [chunk_int_id(i) for i in ids]
+    np.save(os.path.join(store_dir, "labels.npy"), np.array(labels, dtype="int64"))
+    np.save(os.path.join(store_dir, "slots.npy"), hash_slots(labels))
+
+    kinds = {}
+    for key, values in metadata.items():
+        kind = kinds[key] = column_kind(values)
+        name = f"meta.{key}"
+        if kind in ("int", "float"):
+            np.save(os.path.join(store_dir, f"{name}.npy"),
+                    np.array([0 if v is None else v for v in values], dtype="int64" if kind == "int" else "float64"))
+            if None in values:
+                np.save(os.path.join(store_dir, f"{name}.nulls.npy"), np.array([v is None for v in values]))
+        elif kind == "str":
+            write_blob_column(store_dir, name, values)
+        else:
+            write_blob_column(store_dir, name, [None if v is None else json.dumps(v, ensure_ascii=False)
+                                                for v in values])
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"rows": len(ids), "columns": kinds}, f, indent=2)
+
+
+class BlobColumn:
+    """Memory-mapped string column: value i is blob[offsets[i]:offsets[i + 1]], None where flagged null."""
+
+    def __init__(self, store_dir, name):
+        self.offsets = np.load(os.path.join(store_dir, f"{name}.offsets.npy"), mmap_mode="r")
+        nulls_path = os.path.join(store_dir, f"{name}.nulls.npy")
+        self.nulls = np.load(nulls_path, mmap_mode="r") if os.path.exists(nulls_path) else None
+        self.file = open(os.path.join(store_dir, f"{name}.bin"), "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.blob = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __getitem__(self, row):
+        if self.nulls is not None and self.nulls[row]:
+            return None
+        return self.blob[int(self.offsets[row]):int(self.offsets[row + 1])].decode("utf-8")
+
+    def close(self):
+        if isinstance(self.blob, mmap.mmap):
+            self.blob.close()
+        self.file.close()
+
+
+class ChunkTextStore:
+    """
+    Read-only, memory-mapped view of a store written by build_text_store.
+
+    Opening the store only maps the id, label and hash-table files. Texts and metadata
+    columns are opened the first time they are used, and a value is decoded only when it
+    is requested, so a reader that needs chunk ids alone never touches the text. Lookup by
+    chunk id or FAISS label is a hash-table probe. Supports `store[chunk_id]` (text),
+    `chunk_id in store` and `len(store)`.
+
+    Args:
+        store_dir (str): Directory written by build_text_store
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "columns.json"), "r", encoding="utf-8") as f:
+            self.schema = json.load(f)["columns"]
+        self.ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode="r")
+        self.labels = np.load(os.path.join(store_dir, "labels.npy"), mmap_mode="r")
+        self.slots = np.load(os.path.join(store_dir, "slots.npy"), mmap_mode="r")
+        self._texts = None
+        self._columns = {}
+        self._nulls = {}
+
+    @property
+    def columns(self):
+        """Names of the metadata columns (besides chunk_id)."""
+        return list(self.schema)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_of_label(self, label):
+        """Returns the row whose FAISS label is label, or None."""
+        label = int(label)
+        mask = len(self.slots) - 1
+        i = label & mask
+        while True:
+            row = int(self.slots[i])
+            if row < 0:
+                return None
+            if int(self.labels[row]) == label:
+                return row
+            i = (i + 1) & mask
+
+    def row_of(self, chunk_id):
+        """Returns the row of chunk_id, or None if it is not in the store."""
+        row = self.row_of_label(chunk_int_id(chunk_id))
+        return row if row is not None and self.ids[row] == chunk_id else None
+
+    def chunk_id(self, row):
+        return str(self.ids[row])
+
+    def chunk_id_of_label(self, label):
+        """Maps an int64 id returned by an IndexIDMap search back to its chunk id, or None."""
+        row = self.row_of_label(label)
+        return None if row is None else self.chunk_id(row)
+
+    def column(self, name):
+        """
+        Projects one metadata column.
+
+        Returns:
+            np.ndarray | BlobColumn: A memory-mapped array for int/float columns (missing values
+                read as 0, see nulls), an indexable string column for str/json columns (JSON values
+                are returned encoded)
+        """
+        if name not in self._columns:
+            if name not in self.schema:
+                raise KeyError(f"Unknown column: {name}. Available: {self.columns}")
+            if self.schema[name] in STRING_KINDS:
+                self._columns[name] = BlobColumn(self.store_dir, f"meta.{name}")
+            else:
+                self._columns[name] = np.load(os.path.join(self.store_dir, f"meta.{name}.npy"), mmap_mode="r")
+        return self._columns[name]
+
+    def nulls(self, name):
+        """Boolean mask of rows missing column name, or None if every row has it."""
+        if name not in self._nulls:
+            path = os.path.join(self.store_dir, f"meta.{name}.nulls.npy")
+            self._nulls[name] = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+        return self._nulls[name]
+
+    def value(self, row, name):
+        """Metadata value of one row, decoded to its original Python type (None where the row lacks it)."""
+        kind = self.schema.get(name)
+        if kind in ("int", "float"):
+            nulls = self.nulls(name)
+            if nulls is not None and nulls[row]:
+                return None
+            return int(self.column(name)[row]) if kind == "int" else float(self.column(name)[row])
+        v = self.column(name)[row]
+        return json.loads(v) if kind == "json" and v is not None else v
+
+    def metadata(self, row, columns=None):
+        """Metadata dict of one row, limited to columns if given; always includes chunk_id."""
+        names = self.columns if columns is None else columns
+        return {"chunk_id": self.chunk_id(row), **{name: self.value(row, name) for name in names}}
+
+    def text(self, row):
+        if self._texts is None:
+            self._texts = BlobColumn(self.store_dir, "texts")
+        return self._texts[row]
+
+    def iter_chunks(self, columns=None, content=True):
+        """Yields chunks in row order as {"metadata": ..., "content": ...}, reading only the requested columns."""
+        for row in range(len(self)):
+            chunk = {"metadata": self.metadata(row, columns)}
+            if content:
+                chunk["content"] = self.text(row)
+            yield chunk
+
+    def get(self, chunk_id, default=None):
+        row = self.row_of(chunk_id)
+        return default if row is None else self.text(row)
+
+    def __getitem__(self, chunk_id):
+        row = self.row_of(chunk_id)
+        if row is None:
+            raise KeyError(chunk_id)
+        return self.text(row)
+
+    def __contains__(self, chunk_id):
+        return self.row_of(chunk_id) is not None
+
+    def close(self):
+        for col in [self._texts, *self._columns.values()]:
+            if isinstance(col, BlobColumn):
+                col.close()
+
+
+def open_text_store(chunks_path, store_dir=None):
+    """
+    Opens the text store for a chunk JSON file, (re)building it only when it is missing or stale.
+
+    Args:
+        chunks_path (str): Chunk .json or .jsonl file produced by the chunking scripts
+        store_dir (str | None): Store location, defaults to "<chunks_path>.store"
+
+    Returns:
+        ChunkTextStore: The opened store
+    """
+    store_dir = store_dir or chunks_path + ".store"
+    marker = os.path.join(store_dir, "columns.json")  # written last
+    if not os.path.exists(marker) or os.path.getmtime(marker) < os.path.getmtime(chunks_path):
+        build_text_store(iter_chunks(chunks_path), store_dir)
+    return ChunkTextStore(store_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a chunk JSON/JSONL file into a columnar chunk store.")
+    parser.add_argument("chunks", help="Chunk .json or .jsonl file")
+    parser.add_argument("--store", default=None, help="Store directory (default: <chunks>.store)")
+    args = parser.parse_args()
+
+    store = open_text_store(args.chunks, args.store)
+    print(f"✅ {len(store)} chunks with columns {store.columns} in {store.store_dir}")
@@ -0,0 +1,196 @@
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from embedders import EMBEDDERS, get_embedder, get_cache
+from ann_indexes import make_index
+from corpus_chunking import STRATEGIES, chunk_file
+from evaluate_models import TOP_K, QUERY_BATCH_SIZE, load_questions
+from retrieval_metrics import METRIC_NAMES, true_rows_matrix, hit_matrix, compute_metrics
+
+INPUT_DOCX = "data/ACME_Enterprise_Platform (1).docx"
+GROUND_PATH = "data/recursive_ground_dataset.csv"
+OUTPUT_PATH = "chunking_sweep_results.csv"
+MAX_CHARS_GRID = [300, 500, 800, 1200]
+OVERLAP_GRID = [0, 50, 100]
+
+# Ground truth is labelled against one chunking, so relevance is transferred by text overlap:
+# a chunk is relevant when at least RELEVANCE_OVERLAP of the smaller of it and a labelled chunk
+# (counted in SHINGLE_SIZE-word shingles) is shared between the two
+SHINGLE_SIZE = 5
+RELEVANCE_OVERLAP = 0.5
+
+
+def build_grid(strategies, max_chars_grid, overlap_grid):
+    """
+    Expands the sweep grid into chunker configs.
+
+    Structured chunking has no size parameters, so it contributes a single config;
+    overlaps that are not smaller than the chunk size are skipped.
+
+    Returns:
+        list[dict]: Configs with "strategy", "max_chars" and "overlap"
+    """
+    configs = []
+    for strategy in strategies:
+        if strategy == "structured":
+            configs.append({"strategy": strategy, "max_chars": None, "overlap": None})
+            continue
+        for max_chars in max_chars_grid:
+            for overlap in overlap_grid:
+                if overlap < max_chars:
+                    configs.append({"strategy": strategy, "max_chars": max_chars, "overlap": overlap})
+    return configs
+
+
+def run_chunkers(path, configs, workers=None):
+    """
+    Chunks the document once per config in a process pool.
+
+    Returns:
+        list[tuple[list[str], float]]: Non-empty chunk texts and seconds spent, in config order
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"Chunking {len(configs)} configs with {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(chunk_file, [path] * len(configs), ["sweep"] * len(configs),
+                           [c["strategy"] for c in configs],
+                           [c["max_chars"] or 500 for c in configs],
+                           [c["overlap"] or 0 for c in configs])
+        return [([c["content"] for c in chunks if c["content"].strip()], seconds) for _, chunks, seconds in results]
+
+
+def shingles(text, n=SHINGLE_SIZE):
+    words = text.lower().split()
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def relevant_rows(truth_text_lists, chunk_texts, threshold=RELEVANCE_OVERLAP):
+    """
+    Maps each question's labelled chunk texts onto the rows of another chunking.
+
+    Shingles of every chunk are indexed once, so each labelled chunk only touches
+    the chunks it actually shares text with.
+
+    Args:
+        truth_text_lists (list[list[str]]): Texts of the labelled relevant chunks per question
+        chunk_texts (list[str]): Chunk texts of the config being evaluated, in row order
+        threshold (float): Minimum shared fraction of the smaller shingle set
+
+    Returns:
+        list[list[int]]: Relevant rows per question
+    """
+    chunk_shingles = [shingles(t) for t in chunk_texts]
+    postings = {}
+    for row, sh in enumerate(chunk_shingles):
+        for s in sh:
+            postings.setdefault(s, []).append(row)
+
+    rows_per_question = []
+    for truth_texts in truth_text_lists:
+        relevant = set()
+        for text in truth_texts:
+            truth_shingles = shingles(text)
+            shared = Counter(row for s in truth_shingles for row in postings.get(s, ()))
+            relevant.update(row for row, n in shared.items()
+                            if n / min(len(truth_shingles), len(chunk_shingles[row])) >= threshold)
+        rows_per_question.append(sorted(relevant))
+    return rows_per_question
+
+
+def sweep(configs, models, input_path=INPUT_DOCX, ground_path=GROUND_PATH, workers=None):
+    """
+    Evaluates every chunker config with every embedding model.
+
+    Chunk texts are pooled across all configs and each distinct text is embedded once per
+    model (and persisted in the embedding cache), so most configs reuse vectors produced
+    for another one and the grid costs little more than its largest config.
+
+    Args:
+        configs (list[dict]): Chunker configs from build_grid
+        models (list[str]): Embedding providers to evaluate
+        input_path (str): DOCX document to chunk
+        ground_path (str): Ground-truth CSV whose "chunks" column holds the relevant texts
+        workers (int | None): Chunking processes, defaults to the number of CPU cores
+
+    Returns:
+        pd.DataFrame: One row per (config, model) with chunk statistics and retrieval metrics
+    """
+    chunked = run_chunkers(input_path, configs, workers)
+    for config, (texts, _) in zip(configs, chunked):
+        if not texts:
+            print(f"⚠️ Skipping {config}: no chunks produced")
+    kept = [(config, result) for config, result in zip(configs, chunked) if result[0]]
+    configs, chunked = [c for c, _ in kept], [r for _, r in kept]
+
+    questions = load_questions(ground_path, field="text")
+    question_texts = [row["question"] for row, _ in questions]
+    truth_text_lists = [texts for _, texts in questions]
+
+    unique_texts = list(dict.fromkeys(t for texts, _ in chunked for t in texts))
+    text_rows = {t: i for i, t in enumerate(unique_texts)}
+    total = sum(len(texts) for texts, _ in chunked)
+    print(f"{total} chunks across {len(configs)} configs, {len(unique_texts)} distinct texts to embed")
+
+    relevance = [true_rows_matrix(rows, {r: r for r in range(len(texts))})
+                 for rows, texts in ((relevant_rows(truth_text_lists, texts), texts) for texts, _ in chunked)]
+
+    results = []
+    for model_name in models:
+        embedder = get_embedder(model_name)
+        start = time.perf_counter()
+        vectors = np.ascontiguousarray(embedder.embed(unique_texts), dtype="float32")
+        Q = np.ascontiguousarray(embedder.embed(question_texts, batch_size=QUERY_BATCH_SIZE), dtype="float32")
+        embed_seconds = time.perf_counter() - start
+
+        for config, (texts, chunk_seconds), (true_rows, num_true) in zip(configs, chunked, relevance):
+            index = make_index(vectors[[text_rows[t] for t in texts]], "flat")
+            # Configs with fewer than TOP_K chunks get -1 padding, which never counts as a hit
+            D, I = index.search(Q, TOP_K)
+            metrics = compute_metrics(hit_matrix(I, true_rows), num_true)
+
+            results.append({
+                **config,
+                "model": model_name,
+                "chunks": len(texts),
+                "avg_chars": np.mean([len(t) for t in texts]),
+                "relevant_per_question": num_true.mean(),
+                **{m: np.mean(metrics[m]) for m in METRIC_NAMES},
+                "chunk_seconds": chunk_seconds,
+            })
+        print(f"{model_name.upper()}: embedded in {embed_seconds:.2f}s, evaluated {len(configs)} configs")
+
+    return pd.DataFrame(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep chunking strategies and parameters across embedding models.")
+    parser.add_argument("--input", default=INPUT_DOCX)
+    parser.add_argument("--ground", default=GROUND_PATH, help="Ground-truth CSV with relevant chunk texts")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument("--max-chars", nargs="+", type=int, default=MAX_CHARS_GRID)
+    parser.add_argument("--overlap", nargs="+", type=int, default=OVERLAP_GRID)
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDERS), default=["open_source"],
+                        help="Embedding providers to run (default: open_source)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configs = build_grid(args.strategies, args.max_chars, args.overlap)
+    df = sweep(configs, args.models, args.input, args.ground, args.workers)
+
+    print("\nChunking Sweep Results:")
+    print(df.to_string(index=False))
+    df.to_csv(args.output, index=False)
+
+    stats = get_cache().stats()
+    print(f"\nEmbedding cache: {stats['hits']} hits, {stats['misses']} misses")
+    print(f"Results saved to {args.output}")
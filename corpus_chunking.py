@@ -0,0 +1,129 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from docx import Document
+from recursive_chunking import iter_recursive_chunks
+from structured_chunking import chunk_document
+
+INPUT_DIR = "data/"
+OUTPUT_PATH = "data/corpus_chunks.jsonl"
+STRATEGIES = ["recursive", "structured"]
+
+
+def doc_ids_for(paths):
+    """
+    Derives a short, unique document id from each file name, e.g.
+    "ACME_Enterprise_Platform (1).docx" -> "acme_enterprise_platform_1".
+
+    Every file's natural slug is reserved first, and the first file (in sorted-path order) with
+    a given slug keeps it. Other files with that slug get the smallest numeric suffix that is
+    neither reserved nor already assigned, so a suffix never takes another file's natural id.
+    A file with a unique slug keeps its id no matter which files are added or removed; only
+    files sharing a slug can be renumbered when the corpus changes.
+    """
+    paths = sorted(paths)
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+    slugs = {path: re.sub(r"[^a-z0-9]+", "_", stem.lower()).strip("_") or "doc" for path, stem in stems.items()}
+    reserved = set(slugs.values())
+    ids, taken = {}, set()
+    for path in paths:
+        doc_id = slug = slugs[path]
+        n = 1
+        while doc_id in taken or (n > 1 and doc_id in reserved):
+            n += 1
+            doc_id = f"{slug}_{n}"
+        taken.add(doc_id)
+        ids[path] = doc_id
+    return ids
+
+
+def chunk_file(path, doc_id, strategy="recursive", max_chars=500, overlap=50):
+    """
+    Chunks one DOCX file; runs inside a worker process.
+
+    Chunk ids are prefixed with the document id ("<doc_id>:chunk_12") so they are unique
+    across the corpus, and every chunk records its document in metadata.
+
+    Returns:
+        tuple[str, list[dict], float]: The path, its chunks and the seconds spent
+    """
+    start = time.perf_counter()
+    if strategy == "recursive":
+        chunks = list(iter_recursive_chunks(Document(path), max_chars=max_chars, overlap=overlap))
+    elif strategy == "structured":
+        # chunk_document reports every step; keep worker output from interleaving
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = chunk_document(path)
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}. Choose from {STRATEGIES}")
+
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        meta["chunk_id"] = f"{doc_id}:{meta['chunk_id']}"
+        meta["doc_id"] = doc_id
+        meta["source_file"] = os.path.basename(path)
+    return path, chunks, time.perf_counter() - start
+
+
+def chunk_corpus(input_dir, output_path, strategy="recursive", workers=None, max_chars=500, overlap=50):
+    """
+    Chunks every DOCX file in input_dir in a process pool and merges the results into one JSONL file.
+
+    Files are processed in sorted order and results are written in that same order
+    regardless of which worker finishes first, so the output is deterministic.
+
+    Args:
+        input_dir (str): Directory containing .docx files
+        output_path (str): Merged newline-delimited JSON output
+        strategy (str): "recursive" or "structured"
+        workers (int | None): Worker processes, defaults to the number of CPU cores
+        max_chars (int): Recursive chunk size in characters
+        overlap (int): Recursive chunk overlap in characters
+
+    Returns:
+        list[dict]: Per-file timing rows (file, chunks, seconds)
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(input_dir, "*.docx")) if not os.path.basename(p).startswith("~$"))
+    if not paths:
+        raise FileNotFoundError(f"No .docx files found in {input_dir}")
+    doc_ids = doc_ids_for(paths)
+    workers = workers or os.cpu_count() or 1
+    print(f"Chunking {len(paths)} documents with {workers} workers ({strategy})...")
+
+    start = time.perf_counter()
+    timings = []
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output_path, "w", encoding="utf-8") as f:
+        results = pool.map(chunk_file, paths, [doc_ids[p] for p in paths], [strategy] * len(paths),
+                           [max_chars] * len(paths), [overlap] * len(paths))
+        for path, chunks, seconds in results:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            timings.append({"file": os.path.basename(path), "chunks": len(chunks), "seconds": seconds})
+            print(f"  {os.path.basename(path):<50} {len(chunks):>6} chunks {seconds:>8.2f}s")
+
+    total = time.perf_counter() - start
+    print(f"\nSaved {sum(t['chunks'] for t in timings)} chunks from {len(paths)} documents to {output_path}")
+    print(f"Wall time {total:.2f}s, summed per-file time {sum(t['seconds'] for t in timings):.2f}s")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk a directory of DOCX files in parallel.")
+    parser.add_argument("input_dir", nargs="?", default=INPUT_DIR)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="recursive")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-chars", type=int, default=500)
+    parser.add_argument("--overlap", type=int, default=50)
+    args = parser.parse_args()
+
+    chunk_corpus(args.input_dir, args.output, strategy=args.strategy, workers=args.workers,
+                 max_chars=args.max_chars, overlap=args.overlap)
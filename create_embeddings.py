@@ -1,123 +1,238 @@
 import os
-import json
+import argparse
 import faiss
 import numpy as np
-from tqdm import tqdm
-from dotenv import load_dotenv
-from openai import OpenAI
-import cohere
-from sentence_transformers import SentenceTransformer
-
-load_dotenv()
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-
-if not OPENAI_API_KEY or not COHERE_API_KEY:
-    raise ValueError("Missing API keys! Please set OPENAI_API_KEY and COHERE_API_KEY in your .env file.")
+import pandas as pd
+from embedders import EMBEDDERS, DEFAULT_EMBEDDERS, get_embedder, get_cache
+from ann_indexes import INDEX_TYPES, index_spec, make_index, save_index, sweep_index_configs
+from chunk_store import build_text_store, chunk_int_id, iter_chunks
+from incremental_index import build_manifest, load_manifest, save_manifest, diff_manifest, update_index_file
+from bm25 import BM25Index
+from vector_compression import COMPRESSION_LEVELS, MATRYOSHKA_DIMS, make_compressed_index, bytes_per_vector, \
+    compressed_index_path, truncate_embeddings, truncated_index_path, truncated_index_dims
 
 CHUNKS_PATH = "data/acme_recursive_chunks_char.json"
 INDEX_SAVE_PATH = "recursive_embeddings/"
-BATCH_SIZE = 32
 
-with open(CHUNKS_PATH, "r", encoding="utf-8") as f:
-    chunks = json.load(f)
+def load_chunks(path, store_dir):
+    """
+    Streams non-empty chunks into the chunk store and keeps only their ids and texts.
 
-filtered_chunks = [c for c in chunks if c["content"].strip() != ""]
-texts = [c["content"] for c in filtered_chunks]
-metadata = [c["metadata"] for c in filtered_chunks]
+    Accepts both the JSON array and the JSONL output of the chunking scripts; JSONL is
+    consumed line by line, so the chunk dicts are never held in memory all at once.
 
-# OpenAI
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-openai_model = "text-embedding-3-small"
+    Args:
+        path (str): Chunk .json or .jsonl file produced by the chunking scripts
+        store_dir (str): Chunk store to (re)write, see chunk_store.build_text_store
 
-# Cohere
-co = cohere.Client(COHERE_API_KEY)
-cohere_model = "embed-v4.0"
+    Returns:
+        tuple[list[str], list[str]]: Chunk ids and texts, in row order
+    """
+    chunk_ids, texts = [], []
 
-# Sentence Transformers
-hf_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    def collect(chunks):
+        for c in chunks:
+            chunk_ids.append(c["metadata"]["chunk_id"])
+            texts.append(c["content"])
+            yield c
 
-def embed_openai(texts):
+    build_text_store(collect(iter_chunks(path, skip_empty=True)), store_dir)
+    return chunk_ids, texts
+
+def build_faiss_index(embeddings, dim, path, index_type="flat", ids=None, **params):
     """
-    Generates OpenAI embeddings for a list of texts.
+    Builds a FAISS index from a set of embeddings and saves it to disk.
 
     Args:
-        texts (list[str]): List of texts to generate embeddings for
+        embeddings (np.ndarray): A numpy array of shape (n_samples, dim) containing the embeddings to index
+        dim (int): The dimensionality of the embeddings
+        path (str): The path to save the FAISS index to
+        index_type (str): One of "flat", "ivf_flat", "ivf_pq", "hnsw", "opq_ivf_pq"
+        ids (np.ndarray | None): int64 id per row (see chunk_store.chunk_int_id), stored via IndexIDMap2
+        **params: Index parameters (nlist, nprobe, m, hnsw_m, ef_search), see ann_indexes.py
 
     Returns:
-        np.ndarray: A numpy array of shape (len(texts), 384) containing the OpenAI embeddings for each text
+        faiss.Index: The built FAISS index
     """
-    embeddings = []
-    for i in tqdm(range(0, len(texts), BATCH_SIZE), desc="Generating OpenAI Embeddings"):
-        batch = texts[i:i+BATCH_SIZE]
-        response = openai_client.embeddings.create(model=openai_model, input=batch)
-        embeddings.extend([d.embedding for d in response.data])
-    return np.array(embeddings, dtype="float32")
-
-def embed_cohere(texts):
+    assert embeddings.shape[1] == dim, f"Expected {dim}-d embeddings, got {embeddings.shape[1]}"
+    index = make_index(embeddings, index_type, ids=ids, **params)
+    save_index(index, path, index_type, **params)
+    print(f"FAISS {index_type} index saved to {path}")
+    return index
+
+def save_embeddings(embeddings, path):
     """
-    Generates Cohere embeddings for a list of texts.
+    Saves raw embeddings as a .npy matrix whose rows line up with the chunk-id table.
 
     Args:
-        texts (list[str]): List of texts to generate embeddings for
-
-    Returns:
-        np.ndarray: A numpy array of shape (len(texts), 128) containing the Cohere embeddings for each text
+        embeddings (np.ndarray): A numpy array of shape (n_samples, dim)
+        path (str): Destination, e.g. "recursive_embeddings/openai.npy"
     """
-    embeddings = []
-    for i in tqdm(range(0, len(texts), BATCH_SIZE), desc="Generating Cohere Embeddings"):
-        batch = texts[i:i+BATCH_SIZE]
-        resp = co.embed(texts=batch, model=cohere_model)
-        embeddings.extend(resp.embeddings)
-    return np.array(embeddings, dtype="float32")
-
-def embed_hf(texts):
+    np.save(path, np.ascontiguousarray(embeddings, dtype="float32"))
+    print(f"Embeddings saved to {path}")
+
+def build_compressed_indices(embeddings, path, levels, ids=None):
     """
-    Generates SentenceTransformer embeddings for a list of texts.
+    Builds one compressed flat index per level next to the main index.
 
     Args:
-        texts (list[str]): List of texts to generate embeddings for
+        embeddings (np.ndarray): A numpy array of shape (n_samples, dim) containing the embeddings to index
+        path (str): Path of the main index, e.g. "recursive_embeddings/openai.index"
+        levels (list[str]): Compression levels, e.g. ["fp16", "int8", "binary", "pq"]
+        ids (np.ndarray | None): int64 id per row, stored via IndexIDMap2
+    """
+    for level in levels:
+        index = make_compressed_index(embeddings, level, ids=ids)
+        level_path = compressed_index_path(path, level)
+        faiss.write_index(index, level_path)
+        print(f"FAISS {level} index saved to {level_path} ({bytes_per_vector(index)} bytes/vector)")
 
-    Returns:
-        np.ndarray: A numpy array of shape (len(texts), embedding_dim) containing the SentenceTransformer embeddings for each text
+def build_truncated_indices(embeddings, path, dims, index_type="flat", ids=None, **params):
     """
-    print("Generating SentenceTransformer Embeddings...")
-    return np.array(hf_model.encode(texts, show_progress_bar=True), dtype="float32")
+    Builds one index per Matryoshka dimension from the full embeddings, truncated and renormalized.
 
-def build_faiss_index(embeddings, dim, path):
+    Args:
+        embeddings (np.ndarray): Full embeddings of shape (n_samples, dim)
+        path (str): Path of the main index, e.g. "recursive_embeddings/openai.index"
+        dims (list[int]): Target dimensions; those not below the full dimension are skipped
+        index_type (str): One of "flat", "ivf_flat", "ivf_pq", "hnsw", "opq_ivf_pq"
+        ids (np.ndarray | None): int64 id per row, stored via IndexIDMap2
+        **params: Index parameters, see build_faiss_index
     """
-    Builds a FAISS index from a set of embeddings and saves it to disk.
+    for dim in dims:
+        if dim >= embeddings.shape[1]:
+            print(f"⚠️ Skipping {dim}-d variant of {path}: embeddings only have {embeddings.shape[1]} dimensions")
+            continue
+        build_faiss_index(truncate_embeddings(embeddings, dim), dim, truncated_index_path(path, dim), index_type,
+                          ids=ids, **params)
+
+def remove_stale_variants(path, levels, dims):
+    """
+    Deletes compressed copies and truncated variants of an index that this run does not build.
+
+    evaluate_models.py scores every variant it finds next to the main index, so a variant left
+    over from an earlier run (possibly built from a different corpus) would be reported as current.
 
     Args:
-        embeddings (np.ndarray): A numpy array of shape (n_samples, dim) containing the embeddings to index
-        dim (int): The dimensionality of the embeddings
-        path (str): The path to save the FAISS index to
+        path (str): Path of the main index
+        levels (list[str]): Compression levels built this run
+        dims (list[int]): Truncated dimensions built this run
+    """
+    stale = [compressed_index_path(path, level) for level in COMPRESSION_LEVELS[1:] if level not in levels]
+    stale += [truncated_index_path(path, dim) for dim in truncated_index_dims(path) if dim not in dims]
+    for variant in stale:
+        for file in [variant, variant + ".json"]:
+            if os.path.exists(file):
+                os.remove(file)
+                print(f"Removed stale variant {file}")
+
+def update_indices(embeddings, paths, old_manifest, manifest, chunk_rows):
+    """
+    Applies only the changed chunks to existing indices.
+
+    Args:
+        embeddings (np.ndarray): Embeddings of all current chunks, in row order
+        paths (list[str]): Main and compressed index files to update
+        old_manifest (dict[str, str]): Manifest the indices were built from
+        manifest (dict[str, str]): Manifest of the current chunks
+        chunk_rows (dict[str, int]): Row of each current chunk id in embeddings
 
     Returns:
-        faiss.IndexFlatL2: The built FAISS index
+        bool: True if every index was updated in place, False if a full rebuild is needed
     """
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
-    faiss.write_index(index, path)
-    print(f"FAISS index saved to {path}")
-    return index
+    added, removed, changed = diff_manifest(old_manifest, manifest)
+    print(f"Incremental update: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+    upserts = added + changed
+    upsert_embeddings = embeddings[[chunk_rows[cid] for cid in upserts]]
+    return all([update_index_file(path, removed + changed, upserts, upsert_embeddings) for path in paths])
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed chunks and build FAISS indices.")
+    parser.add_argument("--chunks", default=CHUNKS_PATH, help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDERS), default=DEFAULT_EMBEDDERS,
+                        help="Embedding providers to run (default: openai, cohere, open_source)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query")
+    parser.add_argument("--m", type=int, default=None, help="PQ sub-quantizers")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW search depth")
+    parser.add_argument("--compression", nargs="*", choices=COMPRESSION_LEVELS[1:], default=[],
+                        help="Also store compressed copies of every index (evaluated separately)")
+    parser.add_argument("--dims", nargs="*", type=int, default=[],
+                        help=f"Also build truncated, renormalized (Matryoshka) variants, e.g. {MATRYOSHKA_DIMS}")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only add, remove or replace chunks whose content changed since the last run")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Report build time, size, latency and recall vs Flat for every index setting")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    index_params = {
+        "nlist": args.nlist if args.nlist is not None else "auto",
+        "nprobe": args.nprobe,
+        "m": args.m,
+        "hnsw_m": args.hnsw_m,
+        "ef_search": args.ef_search,
+    }
     os.makedirs(INDEX_SAVE_PATH, exist_ok=True)
 
-    print("Starting embedding generation...")
-
-    # --- OpenAI ---
-    openai_embeddings = embed_openai(texts)
-    build_faiss_index(openai_embeddings, openai_embeddings.shape[1], os.path.join(INDEX_SAVE_PATH, "openai.index"))
+    # Row i of every index and .npy matrix is chunk i of the store, which records ids and texts in that order
+    chunk_ids, texts = load_chunks(args.chunks, os.path.join(INDEX_SAVE_PATH, "chunks"))
+    if len(set(chunk_ids)) != len(chunk_ids):
+        raise ValueError(f"Duplicate chunk ids in {args.chunks}")
+    # Explicit FAISS ids: search results are chunk ids, independent of row positions
+    int_ids = np.array([chunk_int_id(cid) for cid in chunk_ids], dtype="int64")
+    chunk_rows = {cid: i for i, cid in enumerate(chunk_ids)}
+    manifest = build_manifest(chunk_ids, texts)
 
-    # --- Cohere ---
-    cohere_embeddings = embed_cohere(texts)
-    build_faiss_index(cohere_embeddings, cohere_embeddings.shape[1], os.path.join(INDEX_SAVE_PATH, "cohere.index"))
-
-    # --- Sentence Transformers ---
-    hf_embeddings = embed_hf(texts)
-    build_faiss_index(hf_embeddings, hf_embeddings.shape[1], os.path.join(INDEX_SAVE_PATH, "open_source.index"))
+    # Lexical index over the same chunks and labels; cheap enough to rebuild on every run
+    BM25Index.build(texts, int_ids).save(os.path.join(INDEX_SAVE_PATH, "bm25"))
 
+    print("Starting embedding generation...")
+    all_embeddings = {}
+
+    for model_name in args.models:
+        # Unchanged chunks are served by the embedding cache, so only edited chunks reach the API
+        embeddings = get_embedder(model_name).embed(texts)
+        all_embeddings[model_name] = embeddings
+        index_path = os.path.join(INDEX_SAVE_PATH, f"{model_name}.index")
+        manifest_path = os.path.join(INDEX_SAVE_PATH, f"{model_name}.manifest.json")
+        save_embeddings(embeddings, os.path.join(INDEX_SAVE_PATH, f"{model_name}.npy"))
+
+        remove_stale_variants(index_path, args.compression, [d for d in args.dims if d < embeddings.shape[1]])
+        old_manifest = load_manifest(manifest_path) if args.incremental else None
+        spec = index_spec(index_path)
+        if old_manifest is not None and spec != {"index_type": args.index_type, **index_params}:
+            # Patching in place would keep the old index type and parameters
+            print(f"⚠️ {index_path} was built as {spec}, rebuilding as {args.index_type} {index_params}")
+            old_manifest = None
+        paths = [index_path] + [compressed_index_path(index_path, level) for level in args.compression]
+        if old_manifest is None or not update_indices(embeddings, paths, old_manifest, manifest, chunk_rows):
+            build_faiss_index(embeddings, embeddings.shape[1], index_path, args.index_type, ids=int_ids,
+                              **index_params)
+            build_compressed_indices(embeddings, index_path, args.compression, ids=int_ids)
+        # Derived from the full vectors without API calls, so simply rebuilt on every run
+        build_truncated_indices(embeddings, index_path, args.dims, args.index_type, ids=int_ids, **index_params)
+        save_manifest(manifest, manifest_path)
+
+    if args.sweep:
+        from evaluate_models import GROUND_PATH, QUERY_BATCH_SIZE, load_questions
+
+        # Real questions as queries: corpus vectors would each find themselves and inflate recall vs Flat
+        question_texts = [row["question"] for row, _ in load_questions(GROUND_PATH)]
+        sweep_results = []
+        for model_name, embeddings in all_embeddings.items():
+            print(f"\nSweeping index configurations for {model_name.upper()}...")
+            queries = get_embedder(model_name).embed(question_texts, batch_size=QUERY_BATCH_SIZE)
+            df = sweep_index_configs(embeddings, queries)
+            df.insert(0, "model", model_name)
+            sweep_results.append(df)
+        pd.concat(sweep_results).to_csv("recursive_index_sweep.csv", index=False)
+        print("\nIndex sweep saved to recursive_index_sweep.csv")
+
+    stats = get_cache().stats()
+    print(f"\nEmbedding cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['entries']} vectors ({stats['bytes'] / 1e6:.1f} MB) on disk")
     print("\nAll embeddings generated and saved successfully!")
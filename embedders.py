@@ -0,0 +1,231 @@
+import os
+from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache
+from async_embedding import TokenBucket, embed_concurrently, estimate_tokens
+from instrumentation import record_usage
+
+load_dotenv()
+
+BATCH_SIZE = 32
+
+# Async pipeline settings: batches in flight per provider and per-minute rate limits (None = unlimited)
+CONCURRENCY = 4
+MAX_RETRIES = 6
+OPENAI_REQUESTS_PER_MINUTE = 3000
+OPENAI_TOKENS_PER_MINUTE = 1_000_000
+COHERE_REQUESTS_PER_MINUTE = 2000
+
+# Embedding cache limits, applied after every write (None = unlimited): least recently used
+# vectors beyond CACHE_MAX_BYTES and vectors older than CACHE_MAX_AGE_DAYS are evicted
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_MAX_AGE_DAYS = 180
+
+# Local encoding: worker processes for large inputs (None = one per CPU core)
+LOCAL_PROCESSES = None
+
+EMBEDDERS = {}
+DEFAULT_EMBEDDERS = ["openai", "cohere", "open_source"]  # run when --models is not given
+_instances = {}
+_cache = None
+
+
+def register_embedder(name):
+    """Class decorator that registers an embedder under a command-line name."""
+    def decorator(cls):
+        cls.name = name
+        EMBEDDERS[name] = cls
+        return cls
+    return decorator
+
+
+def get_cache():
+    """Returns the embedding cache shared by all embedders, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS)
+    return _cache
+
+
+def get_embedder(name):
+    """
+    Returns the embedder registered under name, creating it on first use.
+
+    Clients, credentials and local models are only touched when a provider is
+    actually requested, so a local-only run never needs API keys.
+
+    Args:
+        name (str): A key of EMBEDDERS, e.g. "openai", "cohere" or "open_source"
+
+    Returns:
+        Embedder: The provider instance
+    """
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {name}. Choose from {list(EMBEDDERS)}")
+    if name not in _instances:
+        _instances[name] = EMBEDDERS[name]()
+    return _instances[name]
+
+
+def require_env(var):
+    value = os.getenv(var)
+    if not value:
+        raise ValueError(f"Missing API key! Please set {var} in your .env file.")
+    return value
+
+
+class Embedder:
+    """
+    Common interface of all providers: `embed(texts)` returns a float32 matrix in the order of texts.
+
+    Subclasses implement `embed_uncached(texts)`; `embed` routes it through the shared embedding cache.
+    Remote providers call `record_request` once per successful API request, so local models never
+    show up in the API usage counters.
+    Callers that must not touch the cache (e.g. ad-hoc queries in retrieval_service.py) call
+    `embed_uncached(texts, show_progress=False)` directly.
+    """
+
+    name = None
+    model = None
+    price_per_million_tokens = 0.0  # USD, for cost estimates
+
+    @property
+    def cache_model(self):
+        """Model key in the embedding cache; differs per backend where vectors differ."""
+        return self.model
+
+    def embed(self, texts, batch_size=BATCH_SIZE):
+        """
+        Generates embeddings for a list of texts, only computing those missing from the cache.
+
+        Args:
+            texts (list[str]): List of texts to generate embeddings for
+            batch_size (int): Number of texts per API call or encode batch
+
+        Returns:
+            np.ndarray: A numpy array of shape (len(texts), embedding_dim)
+        """
+        return get_cache().embed(self.name, self.cache_model, list(texts),
+                                 lambda missing: self.embed_uncached(missing, batch_size))
+
+    def record_request(self, batch, tokens=None):
+        """
+        Counts one successful API request in the usage counters (see instrumentation.record_usage).
+
+        Args:
+            batch (list[str]): Texts sent in the request
+            tokens (int | None): Input tokens reported by the provider; estimated from the texts when None
+        """
+        if tokens is None:
+            tokens = estimate_tokens(batch)
+        record_usage(self.name, 1, tokens, tokens / 1e6 * self.price_per_million_tokens)
+
+    def embed_uncached(self, texts, batch_size=BATCH_SIZE, show_progress=True):
+        raise NotImplementedError
+
+
+@register_embedder("openai")
+class OpenAIEmbedder(Embedder):
+    model = "text-embedding-3-small"
+    price_per_million_tokens = 0.02
+
+    def __init__(self):
+        self.api_key = require_env("OPENAI_API_KEY")
+
+    def embed_uncached(self, texts, batch_size=BATCH_SIZE, show_progress=True):
+        from openai import AsyncOpenAI
+
+        # Async clients and limiters are bound to the event loop, so build them per run
+        client = AsyncOpenAI(api_key=self.api_key)
+
+        async def embed_batch(batch):
+            response = await client.embeddings.create(model=self.model, input=batch)
+            self.record_request(batch, response.usage.prompt_tokens if getattr(response, "usage", None) else None)
+            return [d.embedding for d in response.data]
+
+        return embed_concurrently(
+            texts, embed_batch,
+            batch_size=batch_size,
+            concurrency=CONCURRENCY,
+            request_limiter=TokenBucket.per_minute(OPENAI_REQUESTS_PER_MINUTE),
+            token_limiter=TokenBucket.per_minute(OPENAI_TOKENS_PER_MINUTE),
+            max_retries=MAX_RETRIES,
+            desc="Generating OpenAI Embeddings",
+            show_progress=show_progress
+        )
+
+
+@register_embedder("cohere")
+class CohereEmbedder(Embedder):
+    model = "embed-v4.0"
+    price_per_million_tokens = 0.12
+
+    def __init__(self):
+        self.api_key = require_env("COHERE_API_KEY")
+
+    def embed_uncached(self, texts, batch_size=BATCH_SIZE, show_progress=True):
+        import cohere
+
+        client = cohere.AsyncClient(self.api_key)
+
+        async def embed_batch(batch):
+            resp = await client.embed(texts=batch, model=self.model)
+            billed = getattr(getattr(resp, "meta", None), "billed_units", None)
+            tokens = getattr(billed, "input_tokens", None)
+            self.record_request(batch, int(tokens) if tokens is not None else None)
+            return resp.embeddings
+
+        return embed_concurrently(
+            texts, embed_batch,
+            batch_size=batch_size,
+            concurrency=CONCURRENCY,
+            request_limiter=TokenBucket.per_minute(COHERE_REQUESTS_PER_MINUTE),
+            max_retries=MAX_RETRIES,
+            desc="Generating Cohere Embeddings",
+            show_progress=show_progress
+        )
+
+
+@register_embedder("open_source")
+class SentenceTransformerEmbedder(Embedder):
+    model = "sentence-transformers/all-MiniLM-L6-v2"
+    backend = "torch"  # see onnx_backend.BACKENDS
+
+    def __init__(self):
+        self._model = None
+        self._encoder = None
+
+    @property
+    def st_model(self):
+        """The SentenceTransformer, loaded on the first call that needs to encode."""
+        if self._model is None:
+            from onnx_backend import load_sentence_transformer
+            self._model = load_sentence_transformer(self.model, self.backend)
+        return self._model
+
+    @property
+    def cache_model(self):
+        return self.model if self.backend == "torch" else f"{self.model}#{self.backend}"
+
+    @property
+    def local_encoder(self):
+        """Length-bucketed encoder that spreads large inputs over one process per core."""
+        if self._encoder is None:
+            from local_encoding import LocalEncoder
+            self._encoder = LocalEncoder(self.st_model, processes=LOCAL_PROCESSES)
+        return self._encoder
+
+    def embed_uncached(self, texts, batch_size=BATCH_SIZE, show_progress=True):
+        if show_progress:
+            print(f"Generating SentenceTransformer Embeddings ({len(texts)} texts)...")
+        self.local_encoder.batch_size = batch_size
+        return self.local_encoder.encode(texts)
+
+
+@register_embedder("open_source_onnx")
+class OnnxSentenceTransformerEmbedder(SentenceTransformerEmbedder):
+    backend = "onnx"
+
+
+@register_embedder("open_source_int8")
+class Int8SentenceTransformerEmbedder(SentenceTransformerEmbedder):
+    backend = "onnx-int8"
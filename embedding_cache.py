@@ -0,0 +1,324 @@
+import hashlib
+import os
+import sqlite3
+import time
+import numpy as np
+
+CACHE_PATH = "embedding_cache/embeddings.sqlite"
+SQLITE_MAX_PARAMS = 500
+
+
+def text_hash(text):
+    """Returns the SHA-256 hex digest used as the content address of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache backed by SQLite.
+
+    Vectors are keyed by (provider, model, dim, sha256(text)) and stored as raw
+    float32 bytes, so a cached row costs 4 bytes per dimension plus the key.
+    The same cache file is shared by the indexing and evaluation scripts.
+
+    Args:
+        path (str): Location of the SQLite file
+        max_bytes (int | None): Evict least recently used vectors above this total size
+        max_age_days (float | None): Evict vectors created more than this many days ago
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=None, max_age_days=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (provider, model, dim, text_hash)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, provider, model, texts, dim=None):
+        """
+        Looks up cached vectors for a list of texts.
+
+        Args:
+            provider (str): Provider name, e.g. "openai"
+            model (str): Provider model name
+            texts (list[str]): Texts to look up
+            dim (int | None): Requested output dimension, None for the model's native size
+
+        Returns:
+            list[np.ndarray | None]: One vector per text, None where the cache has no entry
+        """
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), SQLITE_MAX_PARAMS):
+            batch = unique[i:i + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE provider = ? AND model = ? AND dim = ? AND text_hash IN ({placeholders})",
+                [provider, model, dim or 0, *batch],
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype="float32")
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? "
+                "WHERE provider = ? AND model = ? AND dim = ? AND text_hash = ?",
+                [(now, provider, model, dim or 0, h) for h in found],
+            )
+            self.conn.commit()
+
+        return [found.get(h) for h in hashes]
+
+    def put_many(self, provider, model, texts, vectors, dim=None):
+        """
+        Stores vectors for a list of texts, replacing existing entries.
+
+        Args:
+            provider (str): Provider name, e.g. "openai"
+            model (str): Provider model name
+            texts (list[str]): Texts the vectors were computed from
+            vectors (np.ndarray): Array of shape (len(texts), embedding_dim)
+            dim (int | None): Requested output dimension, None for the model's native size
+        """
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, np.asarray(vectors, dtype="float32")):
+            blob = vec.tobytes()
+            rows.append((provider, model, dim or 0, text_hash(text), blob, len(blob), now, now))
+        self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.evict()
+
+    def embed(self, provider, model, texts, embed_fn, dim=None):
+        """
+        Returns embeddings for texts, calling embed_fn only for texts not yet cached.
+
+        Duplicate texts are embedded once. Output order always matches the order of texts.
+
+        Args:
+            provider (str): Provider name, e.g. "openai"
+            model (str): Provider model name
+            texts (list[str]): Texts to embed
+            embed_fn (callable): Function mapping list[str] to an array of shape (n, embedding_dim)
+            dim (int | None): Requested output dimension, None for the model's native size
+
+        Returns:
+            np.ndarray: A float32 array of shape (len(texts), embedding_dim)
+        """
+        texts = list(texts)
+        cached = self.get_many(provider, model, texts, dim=dim)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        self.hits += len(texts) - sum(v is None for v in cached)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = np.asarray(embed_fn(missing), dtype="float32")
+            self.put_many(provider, model, missing, new_vectors, dim=dim)
+            fresh = dict(zip(missing, new_vectors))
+            cached = [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+
+        if not cached:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(cached).astype("float32", copy=False)
+
+    def evict(self):
+        """Applies age- and size-based eviction. Returns the number of rows removed."""
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self.conn.execute("DELETE FROM embeddings WHERE created_at < ?", (cutoff,)).rowcount
+
+        if self.max_bytes is not None:
+            total = self.conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = self.conn.execute("SELECT rowid, nbytes FROM embeddings ORDER BY last_used ASC").fetchall()
+                to_delete = []
+                for rowid, nbytes in rows:
+                    if excess <= 0:
+                        break
+                    to_delete.append((rowid,))
+                    excess -= nbytes
+                self.conn.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+                removed += len(to_delete)
+
+        if removed:
+            self.conn.commit()
+        return removed
+
+    def stats(self):
+        """Returns the number of cached vectors and their total size in bytes."""
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.conn.close()
+
+
+class ScoreCache:
+    """
+    Persistent cache of reranker scores, stored in their own table next to the embeddings.
+
+    Scores are keyed by (model, sha256(query), sha256(text)) and stored as single floats,
+    so they never count towards the embedding statistics or the embedding size limit.
+
+    Args:
+        path (str): Location of the SQLite file, shared with EmbeddingCache by default
+        max_entries (int | None): Evict least recently used scores above this many rows
+        max_age_days (float | None): Evict scores created more than this many days ago
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=None, max_age_days=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pair_scores (
+                model TEXT NOT NULL,
+                query_hash TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                score REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, query_hash, text_hash)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_last_used ON pair_scores (last_used)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model, pairs):
+        """
+        Looks up cached scores for a list of (query, text) pairs.
+
+        Args:
+            model (str): Reranker model name
+            pairs (list[tuple[str, str]]): Query and text of each pair
+
+        Returns:
+            list[float | None]: One score per pair, None where the cache has no entry
+        """
+        keys = [(text_hash(q), text_hash(t)) for q, t in pairs]
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        # Two parameters per pair
+        for i in range(0, len(unique), SQLITE_MAX_PARAMS // 2):
+            batch = unique[i:i + SQLITE_MAX_PARAMS // 2]
+            placeholders = ",".join("(?, ?)" for _ in batch)
+            rows = self.conn.execute(
+                f"SELECT query_hash, text_hash, score FROM pair_scores "
+                f"WHERE model = ? AND (query_hash, text_hash) IN (VALUES {placeholders})",
+                [model, *(h for key in batch for h in key)],
+            ).fetchall()
+            for qh, th, score in rows:
+                found[(qh, th)] = score
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE pair_scores SET last_used = ? WHERE model = ? AND query_hash = ? AND text_hash = ?",
+                [(now, model, qh, th) for qh, th in found],
+            )
+            self.conn.commit()
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model, pairs, scores):
+        """
+        Stores scores for a list of (query, text) pairs, replacing existing entries.
+
+        Args:
+            model (str): Reranker model name
+            pairs (list[tuple[str, str]]): Query and text of each pair
+            scores (np.ndarray): One score per pair
+        """
+        now = time.time()
+        rows = [(model, text_hash(q), text_hash(t), float(s), now, now) for (q, t), s in zip(pairs, scores)]
+        self.conn.executemany("INSERT OR REPLACE INTO pair_scores VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.evict()
+
+    def score(self, model, pairs, score_fn):
+        """
+        Returns scores for pairs, calling score_fn only for pairs not yet cached.
+
+        Duplicate pairs are scored once. Output order always matches the order of pairs.
+
+        Args:
+            model (str): Reranker model name
+            pairs (list[tuple[str, str]]): Query and text of each pair
+            score_fn (callable): Function mapping a list of pairs to an array of shape (n,)
+
+        Returns:
+            np.ndarray: A float32 array of shape (len(pairs),)
+        """
+        pairs = [tuple(p) for p in pairs]
+        cached = self.get_many(model, pairs)
+        missing = list(dict.fromkeys(p for p, s in zip(pairs, cached) if s is None))
+        self.hits += len(pairs) - sum(s is None for s in cached)
+        self.misses += len(missing)
+
+        if missing:
+            new_scores = np.asarray(score_fn(missing), dtype="float32")
+            self.put_many(model, missing, new_scores)
+            fresh = dict(zip(missing, new_scores))
+            cached = [s if s is not None else fresh[p] for p, s in zip(pairs, cached)]
+
+        return np.asarray(cached, dtype="float32")
+
+    def evict(self):
+        """Applies age- and count-based eviction. Returns the number of rows removed."""
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self.conn.execute("DELETE FROM pair_scores WHERE created_at < ?", (cutoff,)).rowcount
+
+        if self.max_entries is not None:
+            count = self.conn.execute("SELECT COUNT(*) FROM pair_scores").fetchone()[0]
+            if count > self.max_entries:
+                removed += self.conn.execute(
+                    "DELETE FROM pair_scores WHERE rowid IN "
+                    "(SELECT rowid FROM pair_scores ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+
+        if removed:
+            self.conn.commit()
+        return removed
+
+    def stats(self):
+        """Returns the number of cached scores."""
+        count = self.conn.execute("SELECT COUNT(*) FROM pair_scores").fetchone()[0]
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,106 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from embedders import EMBEDDERS, get_embedder
+from ann_indexes import load_index
+from chunk_store import ChunkTextStore, chunk_int_id
+from evaluate_models import CHUNK_STORE_PATH, GROUND_PATH, INDEX_PATHS, TOP_K, QUERY_BATCH_SIZE, load_questions
+from rerank import RERANK_MODEL, CrossEncoderReranker
+from retrieval_metrics import METRIC_NAMES, true_rows_matrix, hit_matrix, compute_metrics
+
+FIRST_STAGE = "open_source"
+RERANK_DEPTHS = [10, 20, 50]
+OUTPUT_PATH = "recursive_cascade_results.csv"
+
+
+def time_per_query(fn, n_queries):
+    """Runs fn(q) for every query and returns the mean wall time in milliseconds."""
+    start = time.perf_counter()
+    for q in range(n_queries):
+        fn(q)
+    return 1000 * (time.perf_counter() - start) / n_queries
+
+
+def evaluate_cascade(first_stage, depths, baselines=(), rerank_model=RERANK_MODEL):
+    """
+    Evaluates first-stage retrieval of the top-N candidates followed by cross-encoder reranking to TOP_K.
+
+    Quality uses cached pair scores; latency is measured per query as serving would see it,
+    i.e. one search plus one uncached cross-encoder batch over that query's N candidates.
+    Query embedding is excluded from latency since it is shared by every row of a model.
+
+    Args:
+        first_stage (str): Embedding model whose index produces the candidates
+        depths (list[int]): Candidate counts N to rerank
+        baselines (list[str]): Dense models reported without reranking for comparison
+        rerank_model (str): Cross-encoder name
+
+    Returns:
+        pd.DataFrame: One row per configuration with metrics and per-query latency
+    """
+    store = ChunkTextStore(CHUNK_STORE_PATH)
+    questions = load_questions(GROUND_PATH)
+    question_texts = [row["question"] for row, _ in questions]
+    true_id_lists = [true_ids for _, true_ids in questions]
+    true_rows, num_true = true_rows_matrix(true_id_lists, {cid: chunk_int_id(cid) for ids in true_id_lists
+                                                           for cid in ids})
+
+    def text_of(label):
+        return store[store.chunk_id_of_label(label)]
+
+    def row(model, depth, I, search_ms, rerank_ms):
+        metrics = compute_metrics(hit_matrix(I[:, :TOP_K], true_rows), num_true)
+        return {"first_stage": model, "rerank_depth": depth, **{m: np.mean(metrics[m]) for m in METRIC_NAMES},
+                "search_ms": search_ms, "rerank_ms": rerank_ms, "total_ms": search_ms + rerank_ms}
+
+    results = []
+    first = {}
+    for model_name in dict.fromkeys([first_stage, *baselines]):
+        index = load_index(INDEX_PATHS[model_name])
+        Q = np.ascontiguousarray(get_embedder(model_name).embed(question_texts, batch_size=QUERY_BATCH_SIZE),
+                                 dtype="float32")
+        _, I = index.search(Q, max(depths + [TOP_K]))
+        search_ms = time_per_query(lambda q: index.search(Q[q:q + 1], TOP_K), len(Q))
+        results.append(row(model_name, 0, I, search_ms, 0.0))
+        print(f"{model_name.upper()} top-{TOP_K}: recall@5={results[-1]['recall@5']:.3f}, {search_ms:.3f} ms/query")
+        if model_name == first_stage:
+            first = {"index": index, "Q": Q, "I": I}
+
+    reranker = CrossEncoderReranker(rerank_model)
+    for depth in depths:
+        candidates = first["I"][:, :depth]
+        _, I = reranker.rerank(question_texts, candidates, text_of, TOP_K)
+
+        index, Q = first["index"], first["Q"]
+        search_ms = time_per_query(lambda q: index.search(Q[q:q + 1], depth), len(Q))
+        rerank_ms = time_per_query(lambda q: reranker.score_uncached(
+            [(question_texts[q], text_of(c)) for c in candidates[q] if c >= 0]), len(Q))
+        results.append(row(first_stage, depth, I, search_ms, rerank_ms))
+        print(f"{first_stage.upper()} top-{depth} -> rerank top-{TOP_K}: recall@5={results[-1]['recall@5']:.3f}, "
+              f"{search_ms + rerank_ms:.1f} ms/query")
+
+    store.close()
+    return pd.DataFrame(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate retrieve-then-rerank cascades.")
+    parser.add_argument("--first-stage", choices=list(EMBEDDERS), default=FIRST_STAGE,
+                        help="Model whose index retrieves the candidates (default: open_source)")
+    parser.add_argument("--depths", nargs="+", type=int, default=RERANK_DEPTHS,
+                        help="Candidate counts N passed to the reranker")
+    parser.add_argument("--baselines", nargs="*", choices=list(EMBEDDERS), default=[],
+                        help="Dense models reported without reranking, e.g. openai")
+    parser.add_argument("--rerank-model", default=RERANK_MODEL)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    df = evaluate_cascade(args.first_stage, args.depths, args.baselines, args.rerank_model)
+
+    print("\nCascade Evaluation Results (rerank_depth 0 = first stage only):")
+    print(df.to_string(index=False))
+    df.to_csv(OUTPUT_PATH, index=False)
+    print(f"\nResults saved to {OUTPUT_PATH}")
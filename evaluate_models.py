@@ -1,144 +1,198 @@
 import os
-import json
-import faiss
 import ast
+import time
+import argparse
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from dotenv import load_dotenv
-from openai import OpenAI
-import cohere
-from sentence_transformers import SentenceTransformer
-
-load_dotenv()
-
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-co = cohere.Client(os.getenv("COHERE_API_KEY"))
-
-CHUNKS_PATH = "data/acme_recursive_chunks_char.json"
+from embedders import EMBEDDERS, DEFAULT_EMBEDDERS, get_embedder
+from ann_indexes import load_index, read_index_mmap
+from chunk_store import ChunkTextStore, chunk_int_id
+from vector_compression import COMPRESSION_LEVELS, bytes_per_vector, compressed_index_path, \
+    truncate_embeddings, truncated_index_path, truncated_index_dims
+from retrieval_metrics import METRIC_NAMES, true_rows_matrix, hit_matrix, compute_metrics
+from instrumentation import StageRecorder
+from bm25 import BM25Index, rrf_fuse
+from question_results import QuestionResultWriter, question_records
+
+CHUNK_STORE_PATH = "recursive_embeddings/chunks"  # chunk-id table + lazily read texts, written by create_embeddings.py
 GROUND_PATH = "data/recursive_ground_dataset.csv"
+BM25_PATH = "recursive_embeddings/bm25"  # lexical index, written by create_embeddings.py
 INDEX_PATHS = {
     "openai": "recursive_embeddings/openai.index",
     "cohere": "recursive_embeddings/cohere.index",
-    "open_source": "recursive_embeddings/open_source.index"
+    "open_source": "recursive_embeddings/open_source.index",
+    "open_source_onnx": "recursive_embeddings/open_source_onnx.index",
+    "open_source_int8": "recursive_embeddings/open_source_int8.index"
 }
 TOP_K = 5
-
-hf_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-openai_model = "text-embedding-3-small"
-cohere_model = "embed-v4.0"
-
-chunks = json.load(open(CHUNKS_PATH, "r", encoding="utf-8"))
-chunk_id_to_text = {c["metadata"]["chunk_id"]: c["content"] for c in chunks}
-chunk_ids = list(chunk_id_to_text.keys())
-ground_truth = pd.read_csv(GROUND_PATH)
-
-def embed_openai(text):
-    resp = openai_client.embeddings.create(model=openai_model, input=[text])
-    return np.array(resp.data[0].embedding, dtype="float32")
-
-def embed_cohere(text):
-    resp = co.embed(texts=[text], model=cohere_model)
-    return np.array(resp.embeddings[0], dtype="float32")
-
-def embed_hf(text):
-    return np.array(hf_model.encode([text])[0], dtype="float32")
-
-def recall_at_k(true_ids, retrieved_ids, k):
-    return len(set(true_ids) & set(retrieved_ids[:k])) / len(true_ids) if len(true_ids) > 0 else 0.0
-
-def precision_at_k(true_ids, retrieved_ids, k):
-    return len(set(true_ids) & set(retrieved_ids[:k])) / k if k > 0 else 0.0
-
-def mrr(true_ids, retrieved_ids):
-    for rank, rid in enumerate(retrieved_ids, start=1):
-        if rid in true_ids:
-            return 1 / rank
-    return 0.0
-
-def ndcg_at_k(true_ids, retrieved_ids, k):
-    dcg = sum(1 / np.log2(i + 2) for i, rid in enumerate(retrieved_ids[:k]) if rid in true_ids)
-    idcg = sum(1 / np.log2(i + 2) for i in range(min(len(true_ids), k)))
-    return dcg / idcg if idcg > 0 else 0.0
-
-indices = {m: faiss.read_index(path) for m, path in INDEX_PATHS.items()}
-
-all_model_results = []
-all_question_records = []
-
-for model_name, index in indices.items():
-    print(f"\nEvaluating {model_name.upper()}...")
-    metrics = {
-        "recall@3": [], "recall@5": [],
-        "precision@3": [], "precision@5": [],
-        "mrr": [], "ndcg@3": [], "ndcg@5": []
-    }
-
-    for _, row in tqdm(ground_truth.iterrows(), total=len(ground_truth)):
-        q = row["question"]
-
+FUSION_DEPTH = 50  # candidates per retriever passed to reciprocal-rank fusion
+QUERY_BATCH_SIZE = 96  # Cohere accepts at most 96 texts per embed call
+STAGES_PATH = "recursive_evaluation_stages.jsonl"
+QUESTION_RESULTS_PATH = "recursive_per_question_results.jsonl"  # ids, ranks and scores; texts joined on demand
+
+
+def load_questions(path, field="chunk_id"):
+    """
+    Parses the ground-truth CSV once into (row, true_chunk_ids) pairs; rows that fail to parse are skipped.
+    With field="text" the relevant chunks' texts are returned instead of their ids.
+    """
+    ground_truth = pd.read_csv(path)
+    questions = []
+    for _, row in ground_truth.iterrows():
         try:
             gt_chunks = ast.literal_eval(row["chunks"])
         except Exception as e:
             print(f"⚠️ Parse error in row {row.get('question_id', '?')}: {e}")
             continue
-
-        true_ids = [c["chunk_id"] for c in gt_chunks]
-
-        if model_name == "openai":
-            q_emb = embed_openai(q)
-        elif model_name == "cohere":
-            q_emb = embed_cohere(q)
-        else:
-            q_emb = embed_hf(q)
-
-        D, I = index.search(np.array([q_emb]), TOP_K)
-        retrieved_ids = [chunk_ids[i] for i in I[0]]
-        retrieved_texts = [chunk_id_to_text[i] for i in retrieved_ids]
-
-        metrics["recall@3"].append(recall_at_k(true_ids, retrieved_ids, 3))
-        metrics["recall@5"].append(recall_at_k(true_ids, retrieved_ids, 5))
-        metrics["precision@3"].append(precision_at_k(true_ids, retrieved_ids, 3))
-        metrics["precision@5"].append(precision_at_k(true_ids, retrieved_ids, 5))
-        metrics["mrr"].append(mrr(true_ids, retrieved_ids))
-        metrics["ndcg@3"].append(ndcg_at_k(true_ids, retrieved_ids, 3))
-        metrics["ndcg@5"].append(ndcg_at_k(true_ids, retrieved_ids, 5))
-
-        question_record = {
-            "model": model_name,
-            "question_id": row.get("question_id", None),
-            "question": q,
-            "truth_chunks": [
-                {"chunk_id": cid, "text": chunk_id_to_text[cid]}
-                for cid in true_ids if cid in chunk_id_to_text
-            ],
-            "retrieved_chunks": [
-                {"chunk_id": cid, "text": chunk_id_to_text[cid]}
-                for cid in retrieved_ids if cid in chunk_id_to_text
-            ],
-            "recall@3": metrics["recall@3"][-1],
-            "recall@5": metrics["recall@5"][-1],
-            "precision@3": metrics["precision@3"][-1],
-            "precision@5": metrics["precision@5"][-1],
-            "mrr": metrics["mrr"][-1],
-            "ndcg@3": metrics["ndcg@3"][-1],
-            "ndcg@5": metrics["ndcg@5"][-1],
-        }
-        all_question_records.append(question_record)
-
-    summary = {m: np.mean(v) for m, v in metrics.items()}
-    summary["model"] = model_name
-    all_model_results.append(summary)
-
-df_models = pd.DataFrame(all_model_results)
-df_questions = pd.DataFrame(all_question_records)
-
-print("\nCombined Evaluation Results:")
-print(df_models.to_string(index=False))
-
-df_models.to_csv("recursive_evaluation_results.csv", index=False)
-df_questions.to_csv("recursive_detailed_per_question_results.csv", index=False)
-
-print("\nResults saved:")
-print("  - evaluation_results.csv (summary per model)")
-print("  - detailed_per_question_results.csv (per-question results)")
+        questions.append((row, [c[field] for c in gt_chunks]))
+    return questions
+
+
+def load_indices(models):
+    """
+    Loads the main index of each model plus any compressed copies and truncated variants written by
+    `create_embeddings.py --compression ... --dims ...`, which are evaluated alongside it.
+    Truncated variants are keyed "d<dim>", e.g. "d256".
+    """
+    indices = {}
+    for m in models:
+        path = INDEX_PATHS[m]
+        indices[m] = {"fp32": load_index(path)}
+        for level in COMPRESSION_LEVELS[1:]:
+            if os.path.exists(compressed_index_path(path, level)):
+                indices[m][level] = read_index_mmap(compressed_index_path(path, level))
+        for dim in truncated_index_dims(path):
+            indices[m][f"d{dim}"] = load_index(truncated_index_path(path, dim))
+    return indices
+
+
+def evaluate(models, recorder=None, results_path=QUESTION_RESULTS_PATH):
+    """
+    Evaluates every index of the given models against the ground truth.
+
+    Per-question results are appended to results_path after each (model, compression) run
+    instead of being collected in memory (see question_results.py).
+
+    Args:
+        models (list[str]): Embedding providers to evaluate, e.g. ["open_source"]
+        recorder (StageRecorder | None): Records time, API usage and memory of each stage
+        results_path (str): JSON-lines file for the per-question results
+
+    Returns:
+        pd.DataFrame: Summary per (model, compression)
+    """
+    recorder = recorder or StageRecorder()
+    writer = QuestionResultWriter(results_path)
+
+    with recorder.stage("load"):
+        # Memory-mapped: only the id and label columns are read, chunk texts are never decoded
+        store = ChunkTextStore(CHUNK_STORE_PATH)
+        indices = load_indices(models)
+
+        # Parse ground truth once; every model is evaluated on the same questions
+        questions = load_questions(GROUND_PATH)
+        question_texts = [row["question"] for row, _ in questions]
+        true_id_lists = [true_ids for _, true_ids in questions]
+        # Indices are built with IndexIDMap2, so search returns chunk_int_id labels rather than row positions
+        chunk_id_to_label = {cid: chunk_int_id(cid) for ids in true_id_lists for cid in ids}
+        true_rows, num_true = true_rows_matrix(true_id_lists, chunk_id_to_label)
+
+    all_model_results = []
+
+    def score(model_name, compression, D, I, index=None, search_seconds=None):
+        """Scores one result matrix, streams its per-question records and appends its summary row."""
+        with recorder.stage("metrics", model_name, compression=compression):
+            # Score every question at every cutoff in one vectorized pass over the hit matrix
+            metrics = compute_metrics(hit_matrix(I[:, :TOP_K], true_rows), num_true)
+
+            retrieved_ids, retrieved_scores = [], []
+            for row_scores, row_labels in zip(D[:, :TOP_K], I[:, :TOP_K]):
+                hits = [(store.chunk_id_of_label(label), s) for s, label in zip(row_scores, row_labels) if label >= 0]
+                hits = [(cid, s) for cid, s in hits if cid is not None]
+                retrieved_ids.append([cid for cid, _ in hits])
+                retrieved_scores.append([s for _, s in hits])
+            writer.write(question_records(model_name, compression, questions, retrieved_ids, retrieved_scores,
+                                          {m: metrics[m] for m in METRIC_NAMES}))
+
+            summary = {m: np.mean(v) for m, v in metrics.items()}
+            summary["model"] = model_name
+            summary["compression"] = compression
+            summary["dim"] = index.d if index is not None else None
+            summary["bytes_per_vector"] = bytes_per_vector(index) if index is not None else None
+            summary["search_ms"] = 1000 * search_seconds / len(questions) if search_seconds is not None else None
+            # Share of relevant chunks among the FUSION_DEPTH candidates, i.e. the ceiling of a rerank over them;
+            # only known when the deeper candidate list was fetched
+            summary[f"candidate_recall@{FUSION_DEPTH}"] = None
+            if I.shape[1] >= FUSION_DEPTH:
+                depth_metrics = compute_metrics(hit_matrix(I, true_rows), num_true, cutoffs=(FUSION_DEPTH,))
+                summary[f"candidate_recall@{FUSION_DEPTH}"] = np.mean(depth_metrics[f"recall@{FUSION_DEPTH}"])
+            all_model_results.append(summary)
+
+    # Lexical path: no embedding calls, so its results are shared by every fused run below
+    bm25_I = None
+    if os.path.exists(BM25_PATH):
+        bm25 = BM25Index.load(BM25_PATH)
+        with recorder.stage("search", "bm25"):
+            start = time.perf_counter()
+            bm25_D, bm25_I = bm25.search(question_texts, FUSION_DEPTH)
+            search_seconds = time.perf_counter() - start
+        print("\nEvaluating BM25...")
+        score("bm25", "sparse", bm25_D, bm25_I, search_seconds=search_seconds)
+
+    for model_name, levels in indices.items():
+        # Embed every question in as few calls as possible, then search the whole query matrix at once
+        with recorder.stage("query_embed", model_name):
+            Q = np.ascontiguousarray(get_embedder(model_name).embed(question_texts, batch_size=QUERY_BATCH_SIZE),
+                                     dtype="float32")
+
+        for compression, index in levels.items():
+            print(f"\nEvaluating {model_name.upper()} ({compression})...")
+            # Truncated variants are searched with equally truncated, renormalized queries
+            Q_index = Q if index.d == Q.shape[1] else truncate_embeddings(Q, index.d)
+            with recorder.stage("search", model_name, compression=compression):
+                start = time.perf_counter()
+                D, I = index.search(Q_index, TOP_K)
+                search_seconds = time.perf_counter() - start
+                if bm25_I is not None:
+                    # Deeper candidate list for fusion and candidate recall; not part of search_ms
+                    D, I = index.search(Q_index, FUSION_DEPTH)
+            score(model_name, compression, D, I, index, search_seconds)
+
+            if bm25_I is not None and compression == "fp32":
+                hybrid = f"bm25+{model_name}"
+                print(f"\nEvaluating {hybrid.upper()} (reciprocal-rank fusion)...")
+                with recorder.stage("search", hybrid):
+                    fused_D, fused_I = rrf_fuse([I, bm25_I], FUSION_DEPTH)
+                score(hybrid, compression, fused_D, fused_I)
+
+    store.close()
+    return pd.DataFrame(all_model_results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality of the embedding indices.")
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDERS), default=DEFAULT_EMBEDDERS,
+                        help="Embedding providers to evaluate (default: openai, cohere, open_source)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    recorder = StageRecorder(STAGES_PATH)
+    df_models = evaluate(args.models, recorder)
+
+    with recorder.stage("write"):
+        df_models.to_csv("recursive_evaluation_results.csv", index=False)
+
+    print("\nCombined Evaluation Results:")
+    print(df_models.to_string(index=False))
+
+    print("\nPipeline Stages per Model (seconds, API usage, estimated cost):")
+    print(recorder.summary().to_string(index=False))
+    shared = {r["stage"]: r["seconds"] for r in recorder.records if r["model"] is None}
+    print("Shared stages: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in shared.items()))
+
+    print("\nResults saved:")
+    print("  - evaluation_results.csv (summary per model)")
+    print(f"  - {QUESTION_RESULTS_PATH} (per-question chunk ids, ranks and scores)")
+    print(f"  - {STAGES_PATH} (per-stage timings and API usage)")
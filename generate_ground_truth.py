@@ -1,7 +1,12 @@
 import json
 import csv
 import os
+import asyncio
+import hashlib
+import argparse
 import toon
+from chunk_store import iter_chunks
+from async_embedding import call_with_backoff, estimate_tokens
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -11,6 +16,12 @@ INPUT_JSON = "data/acme_recursive_chunks_char.json"
 OUTPUT_CSV = "ground_dataset.csv"
 MODEL_NAME = "gpt-4o"
 TEMPERATURE = 0.0
+RESPONSE_CACHE_DIR = "ground_truth_cache/"  # raw model responses keyed by prompt hash
+
+# Sharded mode: chunk tokens per prompt (leaves room for questions and the answer in gpt-4o's 128k window)
+SHARD_TOKEN_BUDGET = 60_000
+SHARD_CONCURRENCY = 4
+SHARD_TOKENIZER = "tiktoken:o200k_base"  # gpt-4o's encoding
 
 questions = {
     "Q1": "Describe the specific policies and controls available to prevent data loss and control information flow from the Acme application on unmanaged, employee-owned mobile devices. Detail how data can be contained within the application and what actions can be taken if a device is compromised or lost.",
@@ -22,17 +33,25 @@ questions = {
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # requires OPENAI_API_KEY in your environment
 
+PARTIAL_NOTE = (
+    "\n- The context is only one part of the documentation. If none of these chunks answers a question, "
+    "still include the question with an empty \"chunks\" list."
+)
+
 
 def load_chunks(path):
-    """Load and strip metadata; keep only chunk_id and text."""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    simple_chunks = [{"chunk_id": c["metadata"]["chunk_id"], "text": c["content"]} for c in data]
+    """Load (.json or streamed .jsonl) and strip metadata; keep only chunk_id and text."""
+    simple_chunks = [{"chunk_id": c["metadata"]["chunk_id"], "text": c["content"]} for c in iter_chunks(path)]
     return simple_chunks
 
 
-def build_prompt_toon(chunks):
-    """Builds a token-efficient LLM prompt using TOON encoding."""
+def build_prompt_toon(chunks, partial=False):
+    """
+    Builds a token-efficient LLM prompt using TOON encoding.
+
+    With partial=True the chunks are one shard of the corpus, and the model is told that
+    questions not answered by this shard should get an empty chunk list.
+    """
     # Convert chunks to TOON format
     toon_chunks = toon.encode(chunks)
     toon_questions = toon.encode(questions)
@@ -56,7 +75,7 @@ You are given the following Acme documentation in TOON format.
 </QUESTIONS_TOON>
 
 For each question:
-- Identify only the relevant chunk IDs and texts that directly answer it.
+- Identify only the relevant chunk IDs and texts that directly answer it.{PARTIAL_NOTE if partial else ""}
 - Return a JSON array of objects in this exact format:
 [
   {{
@@ -73,8 +92,38 @@ Return only the JSON, no commentary.
     return system_msg, user_msg
 
 
+def response_cache_path(system_msg, user_msg):
+    """Cache file of a prompt: SHA-256 of the model, temperature and both messages."""
+    key = json.dumps([MODEL_NAME, TEMPERATURE, system_msg, user_msg], ensure_ascii=False)
+    return os.path.join(RESPONSE_CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def read_cached_response(system_msg, user_msg):
+    """Parsed response to an earlier identical prompt, or None."""
+    path = response_cache_path(system_msg, user_msg)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_cached_response(system_msg, user_msg, parsed):
+    """Caches a parsed response; only called once parsing succeeded, so malformed replies are retried."""
+    os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+    with open(response_cache_path(system_msg, user_msg), "w", encoding="utf-8") as f:
+        json.dump(parsed, f, ensure_ascii=False)
+
+
 def call_model(system_msg, user_msg):
-    """Calls the LLM with full TOON context."""
+    """
+    Calls the LLM with full TOON context and returns its parsed JSON output.
+
+    An identical earlier prompt is answered from the cache.
+    """
+    cached = read_cached_response(system_msg, user_msg)
+    if cached is not None:
+        print("Using cached model response.")
+        return cached
     print("Sending TOON-encoded dataset to model...")
     response = client.chat.completions.create(
         model=MODEL_NAME,
@@ -84,7 +133,126 @@ def call_model(system_msg, user_msg):
         ],
         temperature=TEMPERATURE,
     )
-    return response.choices[0].message.content
+    parsed = parse_json_response(response.choices[0].message.content)
+    write_cached_response(system_msg, user_msg, parsed)
+    return parsed
+
+
+def count_tokens(texts):
+    """Token count per text with gpt-4o's tokenizer, or the ~4 characters per token estimate without tiktoken."""
+    try:
+        from token_chunking import Tokenizer
+        tokenizer = Tokenizer(SHARD_TOKENIZER)
+    except ImportError:
+        return [estimate_tokens([t]) for t in texts]
+    return [len(ids) for ids in tokenizer.encode_batch(texts)]
+
+
+def shard_chunks(chunks, token_budget=SHARD_TOKEN_BUDGET):
+    """
+    Splits chunks into consecutive shards of at most token_budget tokens (chunk id plus text).
+
+    Neighbouring chunks stay in the same shard, so overlapping chunks are usually labelled together.
+    A single chunk larger than the budget gets a shard of its own.
+    """
+    counts = count_tokens([f"{c['chunk_id']} {c['text']}" for c in chunks])
+    shards, current, current_tokens = [], [], 0
+    for chunk, n_tokens in zip(chunks, counts):
+        if current and current_tokens + n_tokens > token_budget:
+            shards.append(current)
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += n_tokens
+    if current:
+        shards.append(current)
+    return shards
+
+
+async def label_shards_async(prompts, concurrency=SHARD_CONCURRENCY):
+    """
+    Sends one prompt per shard with at most `concurrency` requests in flight.
+
+    Cached prompts never reach the API; fresh responses are cached as soon as they arrive and
+    parse, so an interrupted run resumes where it stopped.
+
+    Args:
+        prompts (list[tuple[str, str]]): (system_msg, user_msg) per shard
+        concurrency (int): Maximum number of requests in flight
+
+    Returns:
+        list[list[dict]]: Parsed model output per shard, in shard order
+    """
+    from openai import AsyncOpenAI
+
+    async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def label(i, system_msg, user_msg):
+        cached = read_cached_response(system_msg, user_msg)
+        if cached is not None:
+            return cached
+
+        async def request():
+            return await async_client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": user_msg},
+                ],
+                temperature=TEMPERATURE,
+            )
+
+        async with semaphore:
+            response = await call_with_backoff(request)
+        parsed = parse_json_response(response.choices[0].message.content)
+        write_cached_response(system_msg, user_msg, parsed)
+        print(f"  shard {i + 1}/{len(prompts)} labelled")
+        return parsed
+
+    return await asyncio.gather(*(label(i, s, u) for i, (s, u) in enumerate(prompts)))
+
+
+def merge_shard_results(shards, shard_outputs):
+    """
+    Reduces per-shard selections into one entry per question.
+
+    Selected chunks are concatenated in corpus order and deduplicated; chunk ids that are not
+    in the shard the model was shown are dropped, and texts are taken from the corpus rather
+    than from the model output. Rationales of shards that selected chunks are joined.
+    """
+    merged = {qid: {"question_id": qid, "question": q, "chunks": [], "rationale": []}
+              for qid, q in questions.items()}
+    seen = {qid: set() for qid in questions}
+    for shard, entries in zip(shards, shard_outputs):
+        texts = {c["chunk_id"]: c["text"] for c in shard}
+        for entry in entries:
+            qid = entry.get("question_id")
+            if qid not in merged:
+                continue
+            selected = [c["chunk_id"] for c in entry.get("chunks") or [] if c.get("chunk_id") in texts]
+            new = [cid for cid in selected if cid not in seen[qid]]
+            if not new:
+                continue
+            seen[qid].update(new)
+            merged[qid]["chunks"].extend({"chunk_id": cid, "text": texts[cid]} for cid in new)
+            if entry.get("rationale"):
+                merged[qid]["rationale"].append(entry["rationale"].strip())
+    return [{**m, "rationale": " ".join(m["rationale"])} for m in merged.values()]
+
+
+def generate_sharded(chunks, token_budget=SHARD_TOKEN_BUDGET, concurrency=SHARD_CONCURRENCY):
+    """
+    Map-reduce labelling: one prompt per token-budgeted shard, sent concurrently, then merged.
+
+    Returns:
+        list[dict]: Entries with question_id, question, chunks and rationale
+    """
+    shards = shard_chunks(chunks, token_budget)
+    print(f"Labelling {len(chunks)} chunks in {len(shards)} shards of up to {token_budget} tokens "
+          f"({concurrency} concurrent requests)...")
+    prompts = [build_prompt_toon(shard, partial=True) for shard in shards]
+    outputs = asyncio.run(label_shards_async(prompts, concurrency))
+    return merge_shard_results(shards, outputs)
 
 
 def parse_json_response(text):
@@ -110,23 +278,37 @@ def write_csv(data, outpath):
     print(f"✅ Ground dataset CSV written to: {outpath}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate the ground-truth dataset with an LLM.")
+    parser.add_argument("--input", default=INPUT_JSON, help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--sharded", action="store_true",
+                        help="Label token-budgeted shards of the corpus concurrently and merge the selections")
+    parser.add_argument("--shard-tokens", type=int, default=SHARD_TOKEN_BUDGET)
+    parser.add_argument("--concurrency", type=int, default=SHARD_CONCURRENCY)
+    return parser.parse_args()
+
+
 def main():
-    if not os.path.exists(INPUT_JSON):
-        raise FileNotFoundError(f"Missing input file: {INPUT_JSON}")
+    args = parse_args()
+    if not os.path.exists(args.input):
+        raise FileNotFoundError(f"Missing input file: {args.input}")
 
-    chunks = load_chunks(INPUT_JSON)
-    print(f"Loaded {len(chunks)} chunks from {INPUT_JSON} (metadata removed).")
+    chunks = load_chunks(args.input)
+    print(f"Loaded {len(chunks)} chunks from {args.input} (metadata removed).")
 
-    system_msg, user_msg = build_prompt_toon(chunks)
-    raw_output = call_model(system_msg, user_msg)
-    parsed = parse_json_response(raw_output)
+    if args.sharded:
+        parsed = generate_sharded(chunks, args.shard_tokens, args.concurrency)
+    else:
+        system_msg, user_msg = build_prompt_toon(chunks)
+        parsed = call_model(system_msg, user_msg)
 
     # Validate keys
     for entry in parsed:
         if not all(k in entry for k in ["question_id", "question", "chunks", "rationale"]):
             raise ValueError(f"Invalid entry missing required keys: {entry}")
 
-    write_csv(parsed, OUTPUT_CSV)
+    write_csv(parsed, args.output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import faiss
+import numpy as np
+from chunk_store import chunk_int_id
+
+
+def content_hash(text):
+    """SHA-256 of a chunk's content, used to detect edits between runs."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_manifest(chunk_ids, texts):
+    """Maps chunk_id -> content hash for the chunks that are in the index."""
+    return {cid: content_hash(text) for cid, text in zip(chunk_ids, texts)}
+
+
+def load_manifest(path):
+    """Returns the manifest saved next to an index, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+
+def diff_manifest(old, new):
+    """
+    Compares two manifests.
+
+    Args:
+        old (dict[str, str]): Manifest the index was built from
+        new (dict[str, str]): Manifest of the current chunk file
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: Added, removed and changed chunk ids
+    """
+    added = [cid for cid in new if cid not in old]
+    removed = [cid for cid in old if cid not in new]
+    changed = [cid for cid in new if cid in old and old[cid] != new[cid]]
+    return added, removed, changed
+
+
+def apply_delta(index, remove_chunk_ids, add_chunk_ids, add_embeddings):
+    """
+    Removes and adds vectors in an IndexIDMap2 in place, keyed by chunk_int_id.
+
+    Changed chunks should be passed in both lists: their old vector is removed and the new one added.
+
+    Args:
+        index (faiss.IndexIDMap2): Index built with ids, loaded without mmap so it is writable
+        remove_chunk_ids (list[str]): Chunk ids to remove
+        add_chunk_ids (list[str]): Chunk ids to add, aligned with add_embeddings
+        add_embeddings (np.ndarray): Vectors of shape (len(add_chunk_ids), dim)
+
+    Raises:
+        RuntimeError: If the index type does not support removal (e.g. HNSW)
+    """
+    if remove_chunk_ids:
+        index.remove_ids(np.array([chunk_int_id(cid) for cid in remove_chunk_ids], dtype="int64"))
+    if add_chunk_ids:
+        index.add_with_ids(np.ascontiguousarray(add_embeddings, dtype="float32"),
+                           np.array([chunk_int_id(cid) for cid in add_chunk_ids], dtype="int64"))
+
+
+def update_index_file(path, remove_chunk_ids, add_chunk_ids, add_embeddings):
+    """
+    Applies a delta to the index stored at path.
+
+    Returns:
+        bool: True if the index was updated, False if it has to be rebuilt (missing, built
+            without ids, or an index type without remove_ids support)
+    """
+    if not os.path.exists(path):
+        return False
+    index = faiss.read_index(path)
+    if not isinstance(index, faiss.IndexIDMap2):
+        return False
+    try:
+        apply_delta(index, remove_chunk_ids, add_chunk_ids, add_embeddings)
+    except RuntimeError as e:
+        print(f"⚠️ Cannot update {path} in place ({str(e).splitlines()[0]}), rebuilding")
+        return False
+    faiss.write_index(index, path)
+    return True
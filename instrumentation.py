@@ -0,0 +1,105 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Provider usage counters, updated by the embedders whenever a request leaves the cache
+USAGE = {}
+
+
+def record_usage(provider, calls, tokens, cost):
+    """Adds API calls, tokens sent and estimated cost in USD to the counters of provider."""
+    usage = USAGE.setdefault(provider, {"api_calls": 0, "tokens": 0, "cost_usd": 0.0})
+    usage["api_calls"] += calls
+    usage["tokens"] += tokens
+    usage["cost_usd"] += cost
+
+
+def usage_totals():
+    """Sums the usage counters over all providers."""
+    totals = {"api_calls": 0, "tokens": 0, "cost_usd": 0.0}
+    for usage in USAGE.values():
+        for key in totals:
+            totals[key] += usage[key]
+    return totals
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class StageRecorder:
+    """
+    Records wall time, API calls, tokens, estimated cost and peak RSS of pipeline stages.
+
+    Every finished stage is kept in memory and, when a path is given, appended to it as a JSON line.
+
+    Args:
+        path (str | None): JSON-lines file to append stage records to
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        if path:
+            open(path, "w", encoding="utf-8").close()
+
+    @contextmanager
+    def stage(self, name, model=None, **fields):
+        """
+        Context manager that measures the enclosed block as one stage.
+
+        Args:
+            name (str): Stage name, e.g. "load", "query_embed", "search", "metrics" or "write"
+            model (str | None): Model the stage belongs to; None for shared stages
+            **fields: Extra values stored on the record, e.g. compression="fp16"
+        """
+        before = usage_totals()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = usage_totals()
+            record = {
+                "stage": name,
+                "model": model,
+                **fields,
+                "seconds": time.perf_counter() - start,
+                "api_calls": after["api_calls"] - before["api_calls"],
+                "tokens": after["tokens"] - before["tokens"],
+                "cost_usd": after["cost_usd"] - before["cost_usd"],
+                "peak_rss_mb": peak_rss_mb(),
+            }
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """
+        Summarizes the recorded stages per model.
+
+        Returns:
+            pd.DataFrame: One row per model with seconds per stage ("<stage>_s"), total seconds,
+                API calls, tokens, estimated cost and the peak RSS reached
+        """
+        df = pd.DataFrame([r for r in self.records if r["model"] is not None])
+        if df.empty:
+            return df
+        seconds = df.pivot_table(index="model", columns="stage", values="seconds", aggfunc="sum")
+        seconds.columns = [f"{stage}_s" for stage in seconds.columns]
+        seconds["total_s"] = seconds.sum(axis=1)
+        totals = df.groupby("model").agg(api_calls=("api_calls", "sum"), tokens=("tokens", "sum"),
+                                         cost_usd=("cost_usd", "sum"), peak_rss_mb=("peak_rss_mb", "max"))
+        return seconds.join(totals).reset_index()
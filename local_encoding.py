@@ -0,0 +1,141 @@
+import argparse
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+
+ENCODE_BATCH_SIZE = 64
+MULTI_PROCESS_MIN_TEXTS = 2_000  # below this, starting worker processes costs more than it saves
+CHUNKS_PER_PROCESS = 4           # work items per worker, so fast (short-text) chunks do not leave workers idle
+OUTPUT_PATH = "local_encoding_throughput.csv"
+
+
+class LocalEncoder:
+    """
+    Encodes texts with a local SentenceTransformer on all CPU cores.
+
+    Texts are sorted by token length before batching, so each batch holds texts of similar
+    length and little compute is spent on padding; with several processes the sorted list is
+    split into contiguous chunks that are handed to a pool of worker processes. Embeddings are
+    returned in the original order.
+
+    Args:
+        model (SentenceTransformer): The loaded model
+        processes (int | None): Worker processes, defaults to the number of CPU cores; 1 encodes in-process
+        batch_size (int): Texts per forward pass
+        bucket (bool): Sort by token length before batching
+        min_pool_texts (int): Smallest input encoded with the worker pool; smaller inputs are encoded in-process
+    """
+
+    def __init__(self, model, processes=None, batch_size=ENCODE_BATCH_SIZE, bucket=True,
+                 min_pool_texts=MULTI_PROCESS_MIN_TEXTS):
+        self.model = model
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.bucket = bucket
+        self.min_pool_texts = min_pool_texts
+        self._pool = None
+
+    @property
+    def pool(self):
+        """Worker pool, started on first use; each worker holds its own copy of the model."""
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+        return self._pool
+
+    def token_lengths(self, texts):
+        """Token count per text, capped at the model's max_seq_length (one batched fast-tokenizer call)."""
+        encoded = self.model.tokenizer(texts, add_special_tokens=True, truncation=True,
+                                       max_length=self.model.max_seq_length)
+        return np.array([len(ids) for ids in encoded["input_ids"]])
+
+    def encode(self, texts):
+        """
+        Encodes texts, bucketed by length and spread over the worker pool when worthwhile.
+
+        Args:
+            texts (list[str]): Texts to encode
+
+        Returns:
+            np.ndarray: float32 embeddings of shape (len(texts), dim), in the order of texts
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype="float32")
+        order = np.argsort(self.token_lengths(texts), kind="stable") if self.bucket else np.arange(len(texts))
+        ordered = [texts[i] for i in order]
+
+        if self.processes > 1 and len(texts) >= self.min_pool_texts:
+            chunk_size = math.ceil(len(texts) / (self.processes * CHUNKS_PER_PROCESS))
+            embeddings = self.model.encode(ordered, pool=self.pool, batch_size=self.batch_size, chunk_size=chunk_size)
+        else:
+            embeddings = self.model.encode(ordered, batch_size=self.batch_size, show_progress_bar=False)
+
+        out = np.empty((len(texts), embeddings.shape[1]), dtype="float32")
+        out[order] = embeddings
+        return out
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+def measure_throughput(model, texts, processes_grid, batch_sizes, bucket_options=(False, True)):
+    """
+    Encodes texts once per (processes, batch_size, bucket) configuration and reports throughput.
+
+    Configurations with several processes always use the worker pool, even for inputs below
+    MULTI_PROCESS_MIN_TEXTS, so every row measures what its processes value says. Pool start-up
+    (one model copy per worker) is excluded from the timings, since a long indexing run pays it
+    once; it is reported separately as startup_s.
+
+    Returns:
+        pd.DataFrame: One row per configuration with seconds, texts_per_s and tokens_per_s
+    """
+    n_tokens = int(LocalEncoder(model).token_lengths(texts).sum())
+    rows = []
+    for processes in processes_grid:
+        for batch_size in batch_sizes:
+            for bucket in bucket_options:
+                encoder = LocalEncoder(model, processes=processes, batch_size=batch_size, bucket=bucket,
+                                       min_pool_texts=0)
+                startup = 0.0
+                if processes > 1:
+                    start = time.perf_counter()
+                    encoder.pool
+                    startup = time.perf_counter() - start
+                start = time.perf_counter()
+                encoder.encode(texts)
+                seconds = time.perf_counter() - start
+                encoder.close()
+                rows.append({"processes": processes, "batch_size": batch_size, "bucket": bucket,
+                             "texts": len(texts), "seconds": seconds, "startup_s": startup,
+                             "texts_per_s": len(texts) / seconds, "tokens_per_s": n_tokens / seconds})
+                print(f"  processes={processes:<3} batch={batch_size:<4} bucket={str(bucket):<5} "
+                      f"{rows[-1]['texts_per_s']:>9.1f} texts/s {rows[-1]['tokens_per_s']:>10.0f} tokens/s")
+    return pd.DataFrame(rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure local SentenceTransformer encoding throughput.")
+    parser.add_argument("--chunks", default="data/acme_recursive_chunks_char.json", help="Chunk file (.json or .jsonl)")
+    parser.add_argument("--repeat", type=int, default=1, help="Repeat the corpus to get a larger workload")
+    parser.add_argument("--processes", nargs="+", type=int, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[32, ENCODE_BATCH_SIZE, 128])
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from chunk_store import iter_chunks
+    from embedders import get_embedder
+
+    args = parse_args()
+    texts = [c["content"] for c in iter_chunks(args.chunks, skip_empty=True)] * args.repeat
+    model = get_embedder("open_source").st_model
+    print(f"Encoding {len(texts)} texts with {model.tokenizer.name_or_path}...")
+    df = measure_throughput(model, texts, args.processes, args.batch_sizes)
+    df.to_csv(args.output, index=False)
+    print(f"\nThroughput saved to {args.output}")
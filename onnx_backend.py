@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+ONNX_CACHE_DIR = "local_models/"
+# Dynamic int8 quantization target; "avx512_vnni" is faster on recent Xeons, "arm64" for ARM machines
+QUANTIZATION_CONFIG = "avx2"
+AGREEMENT_THRESHOLD = 0.99  # minimum mean cosine similarity to the PyTorch embeddings
+MAX_RECALL_DROP = 0.01
+OUTPUT_PATH = "backend_comparison.csv"
+
+
+def onnx_model_dir(model_name):
+    """Local directory of the exported ONNX model, e.g. local_models/sentence-transformers__all-MiniLM-L6-v2-onnx."""
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__") + "-onnx")
+
+
+def load_sentence_transformer(model_name, backend="torch"):
+    """
+    Loads a SentenceTransformer with the requested inference backend.
+
+    torch:     PyTorch fp32 (the default)
+    onnx:      ONNX Runtime fp32, exported once to onnx_model_dir(model_name)
+    onnx-int8: ONNX Runtime with dynamically quantized int8 weights, exported once next to the fp32 model
+
+    Args:
+        model_name (str): HuggingFace model name
+        backend (str): One of BACKENDS
+
+    Returns:
+        SentenceTransformer: The loaded model
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Choose from {BACKENDS}")
+
+    path = onnx_model_dir(model_name)
+    if not os.path.exists(os.path.join(path, "onnx", "model.onnx")):
+        print(f"Exporting {model_name} to ONNX in {path}...")
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(path)
+    if backend == "onnx":
+        return SentenceTransformer(path, backend="onnx")
+
+    quantized = f"onnx/model_qint8_{QUANTIZATION_CONFIG}.onnx"
+    if not os.path.exists(os.path.join(path, quantized)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        print(f"Quantizing {path} to int8 ({QUANTIZATION_CONFIG})...")
+        export_dynamic_quantized_onnx_model(SentenceTransformer(path, backend="onnx"), QUANTIZATION_CONFIG, path)
+    return SentenceTransformer(path, backend="onnx", model_kwargs={"file_name": quantized})
+
+
+def cosine_agreement(A, B):
+    """Row-wise cosine similarity between two embedding matrices of the same texts."""
+    A = A / np.linalg.norm(A, axis=1, keepdims=True)
+    B = B / np.linalg.norm(B, axis=1, keepdims=True)
+    return np.sum(A * B, axis=1)
+
+
+def compare_backends(model_name, chunks_path, ground_path, backends=BACKENDS, batch_size=64):
+    """
+    Encodes the corpus and the ground-truth questions with every backend and compares each to PyTorch.
+
+    Args:
+        model_name (str): HuggingFace model name
+        chunks_path (str): Chunk file whose ids match the ground truth
+        ground_path (str): Ground-truth CSV
+        backends (list[str]): Backends to compare; "torch" is always included as the reference
+        batch_size (int): Texts per forward pass
+
+    Returns:
+        pd.DataFrame: Per backend: texts/s, mean and minimum cosine agreement with PyTorch,
+            recall@k / MRR / nDCG and their change relative to PyTorch
+    """
+    from chunk_store import iter_chunks
+    from evaluate_models import TOP_K, load_questions
+    from retrieval_metrics import METRIC_NAMES, true_rows_matrix, hit_matrix, compute_metrics
+    from ann_indexes import make_index
+
+    chunks = list(iter_chunks(chunks_path, skip_empty=True))
+    texts = [c["content"] for c in chunks]
+    questions = load_questions(ground_path)
+    question_texts = [row["question"] for row, _ in questions]
+    true_rows, num_true = true_rows_matrix([ids for _, ids in questions],
+                                           {c["metadata"]["chunk_id"]: row for row, c in enumerate(chunks)})
+
+    rows, reference = [], None
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        model = load_sentence_transformer(model_name, backend)
+        model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        E = np.asarray(model.encode(texts, batch_size=batch_size), dtype="float32")
+        seconds = time.perf_counter() - start
+        Q = np.asarray(model.encode(question_texts, batch_size=batch_size), dtype="float32")
+
+        _, I = make_index(E, "flat").search(Q, TOP_K)
+        metrics = {m: float(np.mean(v)) for m, v in compute_metrics(hit_matrix(I, true_rows), num_true).items()}
+        if reference is None:
+            reference = {"E": E, "metrics": metrics}
+        agreement = cosine_agreement(E, reference["E"])
+
+        rows.append({
+            "backend": backend,
+            "texts_per_s": len(texts) / seconds,
+            "cosine_mean": float(agreement.mean()),
+            "cosine_min": float(agreement.min()),
+            **metrics,
+            **{f"delta_{m}": metrics[m] - reference["metrics"][m] for m in METRIC_NAMES},
+        })
+        print(f"  {backend:<10} {rows[-1]['texts_per_s']:>8.1f} texts/s  cosine mean {rows[-1]['cosine_mean']:.4f} "
+              f"min {rows[-1]['cosine_min']:.4f}  recall@{TOP_K} {metrics[f'recall@{TOP_K}']:.3f}")
+    return pd.DataFrame(rows)
+
+
+def report(df):
+    """Prints whether each non-PyTorch backend is safe to switch to and how much faster it is."""
+    torch_speed = df.loc[df["backend"] == "torch", "texts_per_s"].iloc[0]
+    delta_cols = [c for c in df.columns if c.startswith("delta_recall")]
+    for _, r in df[df["backend"] != "torch"].iterrows():
+        worst_drop = -min(r[c] for c in delta_cols)
+        ok = r["cosine_mean"] >= AGREEMENT_THRESHOLD and worst_drop <= MAX_RECALL_DROP
+        print(f"{'✅' if ok else '⚠️'} {r['backend']}: {r['texts_per_s'] / torch_speed:.2f}x PyTorch speed, "
+              f"cosine {r['cosine_mean']:.4f}, worst recall change {-worst_drop:+.3f}")
+
+
+if __name__ == "__main__":
+    from embedders import SentenceTransformerEmbedder
+    from evaluate_models import GROUND_PATH
+
+    parser = argparse.ArgumentParser(description="Compare ONNX / int8 backends of the local model with PyTorch.")
+    parser.add_argument("--model", default=SentenceTransformerEmbedder.model)
+    parser.add_argument("--chunks", default="data/acme_recursive_chunks_char.json")
+    parser.add_argument("--ground", default=GROUND_PATH)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    print(f"Comparing backends for {args.model}...")
+    df = compare_backends(args.model, args.chunks, args.ground, args.backends)
+    report(df)
+    df.to_csv(args.output, index=False)
+    print(f"\nComparison saved to {args.output}")
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import pandas as pd
+
+SCORE_DECIMALS = 6
+
+
+class QuestionResultWriter:
+    """
+    Streams per-question results to a JSON-lines file as they are produced.
+
+    Each line holds ids only: the question id, the relevant chunk ids, the retrieved chunk ids
+    in rank order (rank = position + 1) with their scores, and the per-question metrics. Texts
+    are not written; question texts are joined from the ground truth and chunk texts from the
+    chunk store on demand (see join_questions and join_texts). Every call to write is appended
+    and flushed to disk, so a crash keeps all finished (model, compression) runs.
+
+    Args:
+        path (str): JSON-lines file, truncated when the writer is created
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        open(path, "w", encoding="utf-8").close()
+
+    def write(self, records):
+        """Appends records (dicts) and flushes them to disk."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.rows += 1
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def question_records(model_name, compression, questions, retrieved_ids, scores, metrics):
+    """
+    Builds the compact per-question records of one (model, compression) run.
+
+    Args:
+        model_name (str): Model (or retriever) name
+        compression (str): Index variant, e.g. "fp32"
+        questions (list[tuple[pd.Series, list[str]]]): Ground-truth rows and relevant chunk ids, see load_questions
+        retrieved_ids (list[list[str]]): Retrieved chunk ids per question, best first
+        scores (list[list[float]]): Retrieval score of each retrieved chunk
+        metrics (dict[str, np.ndarray]): Per-question metrics from compute_metrics
+
+    Yields:
+        dict: One record per question
+    """
+    for q_idx, ((row, true_ids), ids, row_scores) in enumerate(zip(questions, retrieved_ids, scores)):
+        yield {
+            "model": model_name,
+            "compression": compression,
+            # Ground-truth files without a question_id column are keyed by CSV row
+            "question_id": row["question_id"] if "question_id" in row else int(row.name),
+            "truth_ids": list(true_ids),
+            "retrieved_ids": list(ids),
+            "scores": [round(float(s), SCORE_DECIMALS) for s in row_scores],
+            **{m: float(v[q_idx]) for m, v in metrics.items()},
+        }
+
+
+def load_question_results(path, models=None, compressions=None):
+    """
+    Reads per-question results written by QuestionResultWriter.
+
+    Args:
+        path (str): JSON-lines results file
+        models (list[str] | None): Keep only these models
+        compressions (list[str] | None): Keep only these index variants
+
+    Returns:
+        pd.DataFrame: One row per (model, compression, question)
+    """
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if models and record["model"] not in models:
+                continue
+            if compressions and record["compression"] not in compressions:
+                continue
+            rows.append(record)
+    return pd.DataFrame(rows)
+
+
+def join_questions(df, ground_path):
+    """
+    Adds the question text of every row, read from the ground-truth CSV the results were computed on.
+
+    Args:
+        df (pd.DataFrame): Results from load_question_results
+        ground_path (str): Ground-truth CSV
+
+    Returns:
+        pd.DataFrame: Copy of df with a question column after question_id
+    """
+    ground = pd.read_csv(ground_path)
+    keys = ground["question_id"] if "question_id" in ground else ground.index
+    questions = dict(zip(keys, ground["question"]))
+    df = df.copy()
+    df.insert(df.columns.get_loc("question_id") + 1, "question", df["question_id"].map(questions))
+    return df
+
+
+def join_texts(df, store):
+    """
+    Adds the text of every relevant and retrieved chunk, read from the chunk store.
+
+    Args:
+        df (pd.DataFrame): Results from load_question_results
+        store (ChunkTextStore): Store of the evaluated chunks
+
+    Returns:
+        pd.DataFrame: Copy of df with truth_chunks and retrieved_chunks columns
+            (lists of {"chunk_id", "text"}, as in the former detailed CSV)
+    """
+    def chunks(ids):
+        return [{"chunk_id": cid, "text": store[cid]} for cid in ids if cid in store]
+
+    df = df.copy()
+    df["truth_chunks"] = df["truth_ids"].map(chunks)
+    df["retrieved_chunks"] = df["retrieved_ids"].map(chunks)
+    return df
+
+
+if __name__ == "__main__":
+    from chunk_store import ChunkTextStore
+    from evaluate_models import CHUNK_STORE_PATH, GROUND_PATH, QUESTION_RESULTS_PATH
+
+    parser = argparse.ArgumentParser(description="Export per-question results, optionally with chunk texts.")
+    parser.add_argument("--input", default=QUESTION_RESULTS_PATH)
+    parser.add_argument("--ground", default=GROUND_PATH, help="Ground-truth CSV the results were computed on")
+    parser.add_argument("--models", nargs="+", default=None)
+    parser.add_argument("--compressions", nargs="+", default=None)
+    parser.add_argument("--with-text", action="store_true", help="Join chunk texts from the chunk store")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    df = join_questions(load_question_results(args.input, args.models, args.compressions), args.ground)
+    if args.with_text:
+        store = ChunkTextStore(CHUNK_STORE_PATH)
+        df = join_texts(df, store)
+        store.close()
+    df.to_csv(args.output, index=False)
+    print(f"✅ {len(df)} per-question results saved to {args.output}")
@@ -111,6 +111,101 @@ def recursive_chunk_to_flat_json(tree, parent_heading=None, parent_number=None,
     return chunks
 
 
+def iter_recursive_chunks(doc, max_chars=500, overlap=50, split_fn=None):
+    """
+    Single pass over doc.paragraphs that yields the same chunks as
+    recursive_chunk_to_flat_json(extract_text_with_hierarchy(doc)), without building the tree.
+
+    A section's content ends at the next heading of any level, so its chunks are
+    yielded as soon as that heading (or the end of the document) is reached.
+    Only the open heading path is kept in memory.
+
+    split_fn(text) -> list[str] replaces the character splitter, e.g. with a token-budget splitter.
+    """
+    if split_fn is None:
+        split_fn = lambda text: split_text_recursive(text, max_chars=max_chars, overlap=overlap)
+    counter = 0
+    stack = []        # open sections: {"level", "number", "heading", "children", "lines"}
+    top_level = 0     # number of top-level sections seen so far
+
+    def flush(section):
+        nonlocal counter
+        content = "".join(section["lines"])
+        parent = section["parent"]
+        for c_idx, chunk_text in enumerate(split_fn(content), 1):
+            counter += 1
+            yield {
+                "metadata": {
+                    "chunk_id": f"chunk_{counter}",
+                    "section_number": section["number"],
+                    "subchunk_number": c_idx,
+                    "heading": section["heading"],
+                    "parent_section_number": parent["number"] if parent else None,
+                    "parent_heading": parent["heading"] if parent else None,
+                    "char_length": len(chunk_text),
+                    "word_count": len(chunk_text.split())
+                },
+                "content": chunk_text.strip()
+            }
+        section["lines"] = []
+
+    for para in doc.paragraphs:
+        style = para.style.name if para.style else ""
+
+        if style.startswith("Heading"):
+            try:
+                level = int(style.split(" ")[1])
+            except:
+                continue
+
+            if stack:
+                yield from flush(stack[-1])
+            while stack and stack[-1]["level"] >= level:
+                stack.pop()
+
+            if stack:
+                parent = stack[-1]
+                parent["children"] += 1
+                number = f"{parent['number']}.{parent['children']}"
+            else:
+                parent = None
+                top_level += 1
+                number = str(top_level)
+
+            stack.append({"level": level, "number": number, "heading": para.text.strip(),
+                          "children": 0, "lines": [], "parent": parent})
+        else:
+            text = para.text.strip()
+            if text and stack:
+                stack[-1]["lines"].append(text + "\n")
+
+    if stack:
+        yield from flush(stack[-1])
+
+
+def write_jsonl(chunks, output_path):
+    """Writes chunks as newline-delimited JSON while they are produced. Returns the number written."""
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def recursive_chunk_docx_stream(input_path, output_path, max_chars=500, overlap=50):
+    """
+    Reads DOCX, performs recursive character chunking in a single streaming pass, and saves JSONL.
+    """
+    print(f"Processing document: {input_path}")
+    doc = Document(input_path)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    count = write_jsonl(iter_recursive_chunks(doc, max_chars=max_chars, overlap=overlap), output_path)
+
+    print(f"Saved {count} chunks to {output_path}")
+
+
 def recursive_chunk_docx(input_path, output_path, max_chars=500, overlap=50):
     """
     Reads DOCX, performs recursive character chunking, and saves JSON.
@@ -129,6 +224,16 @@ def recursive_chunk_docx(input_path, output_path, max_chars=500, overlap=50):
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recursive character chunking of a DOCX file.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream chunks to newline-delimited JSON (data/acme_recursive_chunks_char.jsonl)")
+    args = parser.parse_args()
+
     input_file = "data/ACME_Enterprise_Platform (1).docx"
-    output_file = "data/acme_recursive_chunks_char.json"
-    recursive_chunk_docx(input_file, output_file, max_chars=500, overlap=50)
+    if args.stream:
+        recursive_chunk_docx_stream(input_file, "data/acme_recursive_chunks_char.jsonl", max_chars=500, overlap=50)
+    else:
+        output_file = "data/acme_recursive_chunks_char.json"
+        recursive_chunk_docx(input_file, output_file, max_chars=500, overlap=50)
@@ -0,0 +1,91 @@
+import numpy as np
+from embedding_cache import ScoreCache
+from embedders import CACHE_MAX_AGE_DAYS
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BATCH_SIZE = 64
+SCORE_CACHE_MAX_ENTRIES = 10_000_000  # least recently used pair scores beyond this are evicted (None = unlimited)
+_score_cache = None
+
+
+def get_score_cache():
+    """Returns the reranker score cache, opening it on first use."""
+    global _score_cache
+    if _score_cache is None:
+        _score_cache = ScoreCache(max_entries=SCORE_CACHE_MAX_ENTRIES, max_age_days=CACHE_MAX_AGE_DAYS)
+    return _score_cache
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a local cross-encoder.
+
+    Scores are cached by (model, sha256(query), sha256(text)) in their own table of the
+    cache file, so a pair is scored once across runs, depths and first-stage models.
+
+    Args:
+        model (str): HuggingFace cross-encoder name
+        batch_size (int): Pairs per forward pass
+    """
+
+    name = "cross_encoder"
+
+    def __init__(self, model=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self._model = None
+
+    @property
+    def ce_model(self):
+        """The CrossEncoder, loaded on the first call that needs to score."""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model)
+        return self._model
+
+    def score_uncached(self, pairs):
+        """Relevance score per (query, text) pair, computed in batches of batch_size."""
+        if not pairs:
+            return np.zeros(0, dtype="float32")
+        return np.asarray(self.ce_model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                          dtype="float32")
+
+    def score(self, pairs):
+        """
+        Relevance score per (query, text) pair, only running the model for pairs missing from the cache.
+
+        Args:
+            pairs (list[tuple[str, str]]): Query and chunk text
+
+        Returns:
+            np.ndarray: float32 scores of shape (len(pairs),)
+        """
+        return get_score_cache().score(self.model, pairs, self.score_uncached)
+
+    def rerank(self, queries, candidates, text_of, k):
+        """
+        Reorders first-stage candidates of every query by cross-encoder score.
+
+        All pairs of all queries are scored in one batched call.
+
+        Args:
+            queries (list[str]): Query texts
+            candidates (np.ndarray): Candidate labels of shape (len(queries), N), -1 for empty slots
+            text_of (callable): Maps a label to its chunk text
+            k (int): Results to keep per query
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Scores and labels of shape (len(queries), k), best first
+        """
+        valid = candidates >= 0
+        q_idx, c_idx = np.nonzero(valid)
+        scores = np.full(candidates.shape, -np.inf, dtype="float32")
+        scores[q_idx, c_idx] = self.score([(queries[q], text_of(candidates[q, c])) for q, c in zip(q_idx, c_idx)])
+
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        D = np.take_along_axis(scores, order, axis=1)
+        I = np.where(np.isfinite(D), np.take_along_axis(candidates, order, axis=1), -1)
+        if I.shape[1] < k:
+            I = np.pad(I, ((0, 0), (0, k - I.shape[1])), constant_values=-1)
+            D = np.pad(D, ((0, 0), (0, k - D.shape[1])), constant_values=-np.inf)
+        return D, I
@@ -0,0 +1,97 @@
+from functools import lru_cache
+import numpy as np
+
+CUTOFFS = (3, 5)
+METRIC_NAMES = [f"recall@{k}" for k in CUTOFFS] + [f"precision@{k}" for k in CUTOFFS] + ["mrr"] + \
+               [f"ndcg@{k}" for k in CUTOFFS]
+
+
+@lru_cache(maxsize=None)
+def discount_table(k):
+    """
+    Precomputed nDCG tables for ranks 1..k.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Per-rank discounts 1 / log2(rank + 1) and their running sum (IDCG by depth)
+    """
+    discounts = 1 / np.log2(np.arange(k) + 2)
+    return discounts, np.cumsum(discounts)
+
+
+def true_rows_matrix(true_id_lists, id_to_row):
+    """
+    Packs ground-truth chunk ids into a padded matrix of FAISS labels.
+
+    Ids missing from id_to_row can never be retrieved and are stored as -2, so they
+    still count towards the number of relevant chunks but never produce a hit.
+
+    Args:
+        true_id_lists (list[list[str]]): Relevant chunk ids per question
+        id_to_row (dict[str, int]): Maps a chunk id to the label the FAISS index returns for it
+            (its row position, or its id for indices built with IndexIDMap2)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (num_questions x max_relevant) int64 matrix padded with -2,
+            and the number of relevant ids per question
+    """
+    n_true = np.array([len(ids) for ids in true_id_lists], dtype="int64")
+    width = max(int(n_true.max()) if len(n_true) else 0, 1)
+    T = np.full((len(true_id_lists), width), -2, dtype="int64")
+    for q, ids in enumerate(true_id_lists):
+        T[q, :len(ids)] = [id_to_row.get(cid, -2) for cid in ids]
+    return T, n_true
+
+
+def hit_matrix(I, T):
+    """
+    Builds the (num_questions x K) boolean hit matrix from FAISS search results.
+
+    Args:
+        I (np.ndarray): Labels returned by index.search, shape (num_questions, K); -1 marks an empty slot
+        T (np.ndarray): Relevant labels from true_rows_matrix
+
+    Returns:
+        np.ndarray: hits[q, j] is True when the j-th result of question q is relevant
+    """
+    return (I[:, :, None] == T[:, None, :]).any(axis=2) & (I >= 0)
+
+
+def compute_metrics(hits, n_true, cutoffs=CUTOFFS):
+    """
+    Computes recall, precision, MRR and nDCG for every question and cutoff in one pass.
+
+    Matches the per-question definitions: recall@k divides by the number of relevant ids,
+    precision@k by k, MRR uses the first hit within all K results, and IDCG@k sums the
+    discounts of min(num_relevant, k) ideal positions.
+
+    Args:
+        hits (np.ndarray): Boolean hit matrix of shape (num_questions, K)
+        n_true (np.ndarray): Number of relevant chunk ids per question
+        cutoffs (tuple[int]): Cutoffs k to report
+
+    Returns:
+        dict[str, np.ndarray]: Per-question scores keyed by metric name, e.g. "recall@3"
+    """
+    num_questions, K = hits.shape
+    discounts, ideal = discount_table(K)
+    cum_hits = np.cumsum(hits, axis=1)
+    cum_dcg = np.cumsum(hits * discounts, axis=1)
+    has_true = n_true > 0
+    safe_true = np.where(has_true, n_true, 1)
+
+    results = {}
+    for k in cutoffs:
+        results[f"recall@{k}"] = np.where(has_true, cum_hits[:, k - 1] / safe_true, 0.0)
+    for k in cutoffs:
+        results[f"precision@{k}"] = cum_hits[:, k - 1] / k
+
+    any_hit = hits.any(axis=1)
+    first_rank = hits.argmax(axis=1) + 1
+    results["mrr"] = np.where(any_hit, 1 / first_rank, 0.0)
+
+    for k in cutoffs:
+        idcg = np.where(has_true, ideal[np.minimum(safe_true, k) - 1], 0.0)
+        safe_idcg = np.where(idcg > 0, idcg, 1.0)
+        results[f"ndcg@{k}"] = np.where(idcg > 0, cum_dcg[:, k - 1] / safe_idcg, 0.0)
+
+    return results
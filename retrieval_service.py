@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from embedders import EMBEDDERS, get_embedder
+from ann_indexes import load_index
+from chunk_store import ChunkTextStore
+from evaluate_models import CHUNK_STORE_PATH, INDEX_PATHS, TOP_K, QUERY_BATCH_SIZE
+
+HOST = "127.0.0.1"
+PORT = 8000
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 5.0  # how long the first request of a batch waits for others to join
+MAX_K = 100
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for a blocking batch function.
+
+    The first queued item opens a batch, which is closed when it holds max_batch_size items
+    or max_wait_ms has passed. The batch function runs in `executor`, so the event loop keeps
+    accepting requests while a batch is being computed.
+
+    Args:
+        process_batch (callable): Maps a list of items to a list of results in the same order
+        executor (concurrent.futures.Executor): Where process_batch runs
+        max_batch_size (int): Upper bound on items per call
+        max_wait_ms (float): Maximum extra latency a request waits for its batch to fill
+    """
+
+    def __init__(self, process_batch, executor, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """Queues item and waits for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class RetrievalService:
+    """
+    Keeps indices, encoders and the chunk store loaded and answers search requests.
+
+    Each model gets a MicroBatcher, so concurrent queries are embedded with one encode
+    call and searched with one index.search. All batch work runs on a single worker
+    thread: FAISS and the encoders use every core themselves, and the embedding cache's
+    SQLite connection stays on one thread.
+
+    Args:
+        models (list[str]): Embedding providers to serve
+        max_batch_size (int): Queries per batch
+        max_wait_ms (float): Maximum time a query waits for its batch to fill
+    """
+
+    def __init__(self, models, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.store = ChunkTextStore(CHUNK_STORE_PATH)
+        self.indices = {m: load_index(INDEX_PATHS[m]) for m in models}
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batchers = {
+            m: MicroBatcher(lambda items, m=m: self.search_batch(m, items), self.executor, max_batch_size, max_wait_ms)
+            for m in models
+        }
+        self.started = time.time()
+
+    def warm_up(self):
+        """Loads encoders and touches every index before the first request arrives."""
+        for model_name in self.indices:
+            embedder = get_embedder(model_name)
+            if hasattr(embedder, "st_model"):
+                embedder.st_model
+            index = self.indices[model_name]
+            index.search(np.zeros((1, index.d), dtype="float32"), 1)
+
+    def search_batch(self, model_name, items):
+        """
+        Embeds and searches a batch of (query, k) requests in one call each.
+
+        Queries bypass the embedding cache: ad-hoc queries rarely repeat, and a SQLite write
+        per batch would cost more than it saves and grow the cache without bound.
+
+        Returns:
+            list[list[dict]]: Ranked results per request with chunk_id, score and text
+        """
+        queries = [q for q, _ in items]
+        k = max(k for _, k in items)
+        embedder = get_embedder(model_name)
+        Q = np.ascontiguousarray(embedder.embed_uncached(queries, QUERY_BATCH_SIZE, show_progress=False), dtype="float32")
+        D, I = self.indices[model_name].search(Q, k)
+
+        results = []
+        for (_, k_item), scores, labels in zip(items, D, I):
+            hits = []
+            for score, label in zip(scores[:k_item], labels[:k_item]):
+                chunk_id = self.store.chunk_id_of_label(label) if label >= 0 else None
+                if chunk_id is not None:
+                    hits.append({"chunk_id": chunk_id, "score": float(score), "text": self.store[chunk_id]})
+            results.append(hits)
+        return results
+
+    def stats(self):
+        return {
+            "uptime_s": time.time() - self.started,
+            "models": {
+                m: {"requests": b.items, "batches": b.batches,
+                    "avg_batch_size": b.items / b.batches if b.batches else 0.0, "queued": b.queue.qsize()}
+                for m, b in self.batchers.items()
+            },
+        }
+
+    async def route(self, method, path, body):
+        """Dispatches one request. Returns (status, JSON-serializable payload)."""
+        if path == "/health":
+            return 200, {"status": "ok", "models": list(self.indices)}
+        if path == "/stats":
+            return 200, self.stats()
+        if path.startswith("/search/"):
+            model_name = path[len("/search/"):]
+            if model_name not in self.batchers:
+                return 404, {"error": f"Unknown model: {model_name}. Serving {list(self.batchers)}"}
+            if method != "POST":
+                return 405, {"error": "Use POST with a JSON body {\"query\": ..., \"k\": ...}"}
+            try:
+                request = json.loads(body or b"{}")
+                query = request["query"]
+                k = int(request.get("k", TOP_K))
+            except (ValueError, KeyError, TypeError) as e:
+                return 400, {"error": f"Invalid request body: {e}"}
+            if not isinstance(query, str) or not query.strip() or not 1 <= k <= MAX_K:
+                return 400, {"error": f"'query' must be a non-empty string and 1 <= k <= {MAX_K}"}
+            return 200, {"model": model_name, "results": await self.batchers[model_name].submit((query, k))}
+        return 404, {"error": f"No route for {path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive: one JSON request and response at a time per connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    break
+                method, path, _ = parts
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    status, payload = 400, {"error": "Invalid Content-Length header"}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    try:
+                        status, payload = await self.route(method, path.split("?")[0], body)
+                    except Exception as e:
+                        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        workers = [asyncio.create_task(b.run()) for b in self.batchers.values()]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"✅ Serving {list(self.indices)} on http://{host}:{port} "
+              f"(POST /search/<model>, GET /health, GET /stats)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for w in workers:
+                w.cancel()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Long-running retrieval service with query micro-batching.")
+    parser.add_argument("--models", nargs="+", choices=list(EMBEDDERS), default=["open_source"],
+                        help="Embedding providers to serve (default: open_source)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE, help="Queries per encode/search call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="Longest a query waits for others to join its batch")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    service = RetrievalService(args.models, args.max_batch, args.max_wait_ms)
+    print("Loading encoders and indices...")
+    service.warm_up()
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
@@ -1,202 +1,184 @@
 import json
 import os
+import re
 from docx import Document
 
 INPUT_DOCX = "data/ACME_Enterprise_Platform (1).docx"
 OUTPUT_JSON = "data/chunks.json"
 os.makedirs("data", exist_ok=True)
 
-# Define TOC structure from the document
-STRUCTURE = {
-    "1": {"heading": "Executive Summary", "subsections": []},
-    "2": {
-        "heading": "Introduction to Acme",
-        "subsections": [
-            {"number": "2.1", "heading": "Our Mission"},
-            {"number": "2.2", "heading": "The Acme Platform: Redefining Enterprise Communication"}
-        ]
-    },
-    "3": {
-        "heading": "Core Platform Features",
-        "subsections": [
-            {"number": "3.1", "heading": "Seamless Communication"},
-            {"number": "3.2", "heading": "Enhanced Collaboration"},
-            {"number": "3.3", "heading": "Productivity & Workflow Automation"}
-        ]
-    },
-    "4": {
-        "heading": "Acme Intelligence: The Future of Work",
-        "subsections": [
-            {"number": "4.1", "heading": "AI-Powered Summaries & Recaps"},
-            {"number": "4.2", "heading": "Intelligent Search & Discovery"},
-            {"number": "4.3", "heading": "Proactive Task & Action Item Detection"},
-            {"number": "4.4", "heading": "AI and Data Governance"}
-        ]
-    },
-    "5": {
-        "heading": "Enterprise-Grade Security",
-        "subsections": [
-            {"number": "5.1", "heading": "Data Encryption"},
-            {"number": "5.2", "heading": "Identity and Access Management (IAM)"},
-            {"number": "5.3", "heading": "Network and Infrastructure Security"},
-            {"number": "5.4", "heading": "Application Security & DevSecOps"},
-            {"number": "5.5", "heading": "Physical Security of Data Centers"}
-        ]
-    },
-    "6": {
-        "heading": "Compliance and Data Governance",
-        "subsections": [
-            {"number": "6.1", "heading": "Global Certifications and Attestations"},
-            {"number": "6.2", "heading": "Data Residency and Sovereignty"},
-            {"number": "6.3", "heading": "eDiscovery & Legal Hold"},
-            {"number": "6.4", "heading": "Data Loss Prevention (DLP)"}
-        ]
-    },
-    "7": {
-        "heading": "Reliability & Disaster Recovery",
-        "subsections": [
-            {"number": "7.1", "heading": "High-Availability Architecture"},
-            {"number": "7.2", "heading": "Backup and Recovery Strategy"},
-            {"number": "7.3", "heading": "Disaster Recovery (DR) Plan and Testing"}
-        ]
-    },
-    "8": {
-        "heading": "Platform Architecture & Integrations",
-        "subsections": [
-            {"number": "8.1", "heading": "High-Level System Architecture"},
-            {"number": "8.2", "heading": "Robust API and Integration Ecosystem"}
-        ]
-    },
-    "9": {
-        "heading": "Company Overview & Structure",
-        "subsections": [
-            {"number": "9.1", "heading": "Leadership Team"},
-            {"number": "9.2", "heading": "Organizational Commitment to Security"},
-            {"number": "9.3", "heading": "Our Enterprise Focus"}
-        ]
-    },
-    "10": {"heading": "Support & Professional Services", "subsections": []},
-    "11": {"heading": "Contact Information", "subsections": []},
-    "12": {
-        "heading": "Advanced Security & Threat Management",
-        "subsections": [
-            {"number": "12.1", "heading": "Zero Trust Architecture Philosophy"},
-            {"number": "12.2", "heading": "Proactive Threat Intelligence Program"},
-            {"number": "12.3", "heading": "Incident Response Lifecycle"},
-            {"number": "12.4", "heading": "Software Supply Chain Security (SBOM)"}
-        ]
-    },
-    "13": {
-        "heading": "Advanced Data Governance & Control",
-        "subsections": [
-            {"number": "13.1", "heading": "Customizable Data Retention Policies"},
-            {"number": "13.2", "heading": "Ethical Walls & Information Barriers"},
-            {"number": "13.3", "heading": "Comprehensive Audit Logs for SIEM Integration"}
-        ]
-    },
-    "14": {
-        "heading": "Responsible AI & Model Governance",
-        "subsections": [
-            {"number": "14.1", "heading": "Acme's AI Ethics Framework"},
-            {"number": "14.2", "heading": "AI Model Governance and Validation"}
-        ]
-    },
-    "15": {
-        "heading": "Mobile Enterprise Management",
-        "subsections": [
-            {"number": "15.1", "heading": "MDM & MAM Integration"},
-            {"number": "15.2", "heading": "Mobile-Specific Security Controls"}
-        ]
-    },
-    "16": {
-        "heading": "Platform Scalability & Accessibility",
-        "subsections": [
-            {"number": "16.1", "heading": "Proven Scalability Metrics"},
-            {"number": "16.2", "heading": "Global Performance Architecture"},
-            {"number": "16.3", "heading": "Commitment to Accessibility (WCAG 2.1)"}
-        ]
-    },
-    "17": {
-        "heading": "Enterprise Partnership & Success",
-        "subsections": [
-            {"number": "17.1", "heading": "Change Management & Adoption Services"},
-            {"number": "17.2", "heading": "Enterprise Customer Advisory Board (CAB)"},
-            {"number": "17.3", "heading": "Service Level Agreement (SLA) Breakdown"}
-        ]
-    }
-}
-
-
-
-def build_sections_to_chunk():
+# Numbered section headings such as "2. Introduction to Acme" or "2.1 Our Mission"
+SECTION_PATTERN = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+(\S.*)$")
+# Dot leaders and page numbers of TOC entries, e.g. "Introduction ........ 4"
+TOC_LEADER = re.compile(r"(\s*\.{2,}\s*\d*|\t+\d*)\s*$")
+
+
+def heading_level(style):
+    """Outline level of a "Heading N" paragraph style, or None for any other style."""
+    if not style.startswith("Heading"):
+        return None
+    try:
+        return int(style.split(" ")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def build_styled_section_map(records):
+    """
+    Section map from "Heading N" paragraph styles alone, for documents whose headings carry no numbers.
+
+    Sections are numbered by position in the outline ("1", "1.1", "1.2", "2", ...), the same
+    way recursive_chunking.iter_recursive_chunks numbers them.
+    """
+    section_map = {}
+    stack = []  # open sections: (level, number, child count)
+    top_level = 0
+    for i, (text, style) in enumerate(records):
+        level = heading_level(style)
+        if level is None:
+            continue
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        if stack:
+            parent_level, parent, children = stack[-1]
+            stack[-1] = (parent_level, parent, children + 1)
+            number = f"{parent}.{children + 1}"
+        else:
+            parent = None
+            top_level += 1
+            number = str(top_level)
+        stack.append((level, number, 0))
+        section_map[number] = {"heading": text, "para_index": i, "parent": parent}
+    return section_map
+
+
+def build_section_map(records):
+    """
+    Single pass over the content paragraphs that records every numbered section heading.
+
+    Paragraphs styled as headings are used when the document has any numbered ones;
+    if headings exist but none is numbered, sections follow the heading styles instead
+    (see build_styled_section_map); otherwise any paragraph with a number prefix counts,
+    so plain-text documents still work.
+    A section is only accepted if its parent number (e.g. "2" for "2.1") was seen before it,
+    which keeps numbered list items in the body from being mistaken for sections.
+
+    Args:
+        records (list[tuple[str, str]]): (text, style name) per content paragraph
+
+    Returns:
+        dict[str, dict]: section number -> {"heading", "para_index", "parent"} in document order
+    """
+    candidates = []
+    for i, (text, style) in enumerate(records):
+        m = SECTION_PATTERN.match(text)
+        if m:
+            candidates.append((i, m.group(1), m.group(2).strip(), style.startswith("Heading")))
+
+    if any(is_heading for *_, is_heading in candidates):
+        candidates = [c for c in candidates if c[3]]
+    elif any(heading_level(style) is not None for _, style in records):
+        return build_styled_section_map(records)
+
+    section_map = {}
+    for i, number, heading, _ in candidates:
+        parent = number.rsplit(".", 1)[0] if "." in number else None
+        if number in section_map or (parent is not None and parent not in section_map):
+            continue
+        section_map[number] = {"heading": heading, "para_index": i, "parent": parent}
+    return section_map
+
+
+def derive_structure(section_map):
     """
-    Build a flat list of sections to chunk based on TOC structure.
+    Builds the table of contents from the section map, in the same shape the chunker consumes:
+    {"2": {"heading": "Introduction to Acme", "subsections": [{"number": "2.1", "heading": "Our Mission"}]}}.
+    Deeper levels are flattened under their top-level section.
+    """
+    structure = {}
+    for number, sec in section_map.items():
+        if sec["parent"] is None:
+            structure[number] = {"heading": sec["heading"], "subsections": []}
+        else:
+            structure[number.split(".")[0]]["subsections"].append({"number": number, "heading": sec["heading"]})
+    return structure
+
+
+def build_sections_to_chunk(section_map):
+    """
+    Build a flat list of sections to chunk based on the document's own TOC.
     Rule: If section has subsections, only chunk the subsections.
           If section has no subsections, chunk the main section.
     """
+    has_children = {sec["parent"] for sec in section_map.values() if sec["parent"] is not None}
     sections = []
     
-    for num, data in STRUCTURE.items():
-        if data["subsections"]:
-            # Has subsections - only add subsections
-            for sub in data["subsections"]:
-                sections.append({
-                    "section_number": sub["number"],
-                    "heading": sub["heading"],
-                    "parent_section": num,
-                    "parent_heading": data["heading"]
-                })
-        else:
-            # No subsections - add the main section
-            sections.append({
-                "section_number": num,
-                "heading": data["heading"],
-                "parent_section": None,
-                "parent_heading": None
-            })
+    for num, sec in section_map.items():
+        if num in has_children:
+            # Has subsections - only its subsections are chunked
+            continue
+        parent = section_map[sec["parent"]] if sec["parent"] else None
+        sections.append({
+            "section_number": num,
+            "heading": sec["heading"],
+            "parent_section": sec["parent"],
+            "parent_heading": parent["heading"] if parent else None,
+            "para_index": sec["para_index"]
+        })
     
     return sections
 
 
-def get_content_paragraphs(doc):
+def find_content_start(records):
     """
-    Get all paragraphs starting from page 3 (content after TOC).
+    Index of the first content paragraph, i.e. the first section heading after any table of contents.
+
+    The first numbered paragraph styled as a heading starts the content, since TOC entries
+    use TOC or body styles. Without heading styles, the TOC and the body both list the first
+    top-level section, so its last occurrence (ignoring dot leaders and page numbers) is used.
+
+    Args:
+        records (list[tuple[str, str]]): (text, style name) per non-empty paragraph
+
+    Returns:
+        int: Index into records; 0 if the document has no numbered headings
     """
-    paragraphs = []
-    found_start = False
-    
+    candidates = []
+    for i, (text, style) in enumerate(records):
+        m = SECTION_PATTERN.match(text)
+        if m:
+            candidates.append((i, m.group(1), TOC_LEADER.sub("", m.group(2)).strip(), style.startswith("Heading")))
+    if not candidates:
+        return 0
+
+    headings = [i for i, _, _, is_heading in candidates if is_heading]
+    if headings:
+        return headings[0]
+    # Unnumbered heading styles: sections come from the styles, so numbered paragraphs mark nothing
+    if any(heading_level(style) is not None for _, style in records):
+        return 0
+
+    _, number, heading, _ = next((c for c in candidates if "." not in c[1]), candidates[0])
+    return max(i for i, n, h, _ in candidates if (n, h) == (number, heading))
+
+
+def get_content_paragraph_records(doc):
+    """
+    Get (text, style name) for all non-empty paragraphs from the first section heading on (content after TOC).
+    """
+    records = []
     for para in doc.paragraphs:
         text = para.text.strip()
-        if not text:
-            continue
-        
-        # Start from "1. Executive Summary"
-        if not found_start and text.startswith("1.") and "Executive Summary" in text:
-            found_start = True
-        
-        if found_start:
-            paragraphs.append(text)
-    
-    return paragraphs
+        if text:
+            records.append((text, para.style.name if para.style else ""))
+    return records[find_content_start(records):]
 
 
-def find_section_index(section_num, heading, paragraphs):
+def get_content_paragraphs(doc):
     """
-    Find the paragraph index where this section starts.
+    Get all paragraphs from the first section heading on (content after TOC).
     """
-    # Try different matching patterns
-    patterns = [
-        f"{section_num}. {heading}",
-        f"{section_num}.  {heading}",
-        f"{section_num} {heading}"
-    ]
-    
-    for i, para in enumerate(paragraphs):
-        for pattern in patterns:
-            if para.startswith(pattern):
-                return i
-    
-    return None
+    return [text for text, _ in get_content_paragraph_records(doc)]
 
 
 def chunk_document(docx_path):
@@ -212,35 +194,29 @@ def chunk_document(docx_path):
     print(f"Loading document: {docx_path}")
     doc = Document(docx_path)
     
-    # Build sections list from TOC
-    print("\nStep 1: Building sections to chunk from TOC structure...")
-    sections_to_chunk = build_sections_to_chunk()
-    print(f"Total sections to chunk: {len(sections_to_chunk)}")
-    print("-"*80)
-    for sec in sections_to_chunk:
-        parent_info = f" (parent: {sec['parent_section']})" if sec['parent_section'] else ""
-        print(f"  {sec['section_number']:<10} | {sec['heading']}{parent_info}")
-    print("-"*80)
-    
     # Get all content paragraphs
-    print("\nStep 2: Extracting content paragraphs from page 3...")
-    paragraphs = get_content_paragraphs(doc)
+    print("\nStep 1: Extracting content paragraphs after the TOC...")
+    records = get_content_paragraph_records(doc)
+    paragraphs = [text for text, _ in records]
     print(f"Extracted {len(paragraphs)} paragraphs")
     
-    # Find each section in the content
-    print("\nStep 3: Locating sections in content...")
-    section_positions = []
+    # Locate every numbered heading in one pass and derive the TOC from it
+    print("\nStep 2: Building section map and TOC from the document...")
+    section_map = build_section_map(records)
+    if not section_map:
+        print(f"⚠️ No numbered or heading-styled sections found in {docx_path}; no chunks created")
+        return []
+    toc = derive_structure(section_map)
+    print(f"Found {len(toc)} top-level sections, {len(section_map)} sections in total")
     
-    for sec in sections_to_chunk:
-        idx = find_section_index(sec["section_number"], sec["heading"], paragraphs)
-        if idx is not None:
-            section_positions.append({
-                **sec,
-                "para_index": idx
-            })
-            print(f"  ✓ Found {sec['section_number']:<10} at paragraph {idx}")
-        else:
-            print(f"  ✗ NOT FOUND: {sec['section_number']} - {sec['heading']}")
+    print("\nStep 3: Selecting sections to chunk...")
+    section_positions = build_sections_to_chunk(section_map)
+    print(f"Total sections to chunk: {len(section_positions)}")
+    print("-"*80)
+    for sec in section_positions:
+        parent_info = f" (parent: {sec['parent_section']})" if sec['parent_section'] else ""
+        print(f"  {sec['section_number']:<10} | {sec['heading']}{parent_info} @ paragraph {sec['para_index']}")
+    print("-"*80)
     
     # Create chunks
     print(f"\nStep 4: Creating chunks from {len(section_positions)} sections...")
@@ -0,0 +1,182 @@
+import argparse
+import os
+import re
+from docx import Document
+from recursive_chunking import iter_recursive_chunks, write_jsonl
+
+INPUT_DOCX = "data/ACME_Enterprise_Platform (1).docx"
+OUTPUT_JSONL = "data/acme_token_chunks.jsonl"
+
+# Default tokenizer per embedding model, and the chunk size that fits each model well
+MODEL_TOKENIZERS = {
+    "openai": "tiktoken:cl100k_base",
+    "cohere": "tiktoken:cl100k_base",
+    "open_source": "hf:sentence-transformers/all-MiniLM-L6-v2",
+}
+MODEL_TOKEN_BUDGETS = {
+    "openai": 512,
+    "cohere": 512,
+    "open_source": 256,  # all-MiniLM-L6-v2 truncates input at 256 word pieces
+}
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class Tokenizer:
+    """
+    Thin adapter over a fast batch tokenizer.
+
+    Spec "tiktoken:<encoding>" uses tiktoken (same BPE as the OpenAI embedding models),
+    "hf:<model>" uses the Rust-backed HuggingFace fast tokenizer of that model.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, name = spec.partition(":")
+        if kind == "tiktoken":
+            try:
+                import tiktoken
+            except ImportError as e:
+                raise ImportError("Token-aware chunking with tiktoken requires `pip install tiktoken`") from e
+            self.encoding = tiktoken.get_encoding(name)
+            self._encode_batch = self.encoding.encode_ordinary_batch
+            self._decode = self.encoding.decode
+        elif kind == "hf":
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+            self._encode_batch = lambda texts: tokenizer(texts, add_special_tokens=False)["input_ids"]
+            self._decode = lambda ids: tokenizer.decode(ids, clean_up_tokenization_spaces=False)
+        else:
+            raise ValueError(f"Unknown tokenizer spec: {spec}. Use 'tiktoken:<encoding>' or 'hf:<model>'")
+
+    def encode_batch(self, texts):
+        return self._encode_batch(list(texts)) if texts else []
+
+    def decode(self, ids):
+        return self._decode(ids)
+
+
+def split_sentences(text):
+    """Splits text on sentence-ending punctuation and line breaks."""
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+
+
+def split_text_by_tokens(text, tokenizer, max_tokens=256, overlap_tokens=32):
+    """
+    Packs whole sentences into chunks of at most max_tokens tokens.
+
+    All sentences are tokenized in one batch call. Consecutive chunks share trailing
+    sentences worth up to overlap_tokens tokens. A single sentence longer than max_tokens
+    is cut on token boundaries (never inside a word piece), with the same token overlap.
+
+    Args:
+        text (str): Text to split
+        tokenizer (Tokenizer): Batch tokenizer
+        max_tokens (int): Token budget per chunk
+        overlap_tokens (int): Tokens shared with the previous chunk
+
+    Returns:
+        list[str]: Chunk texts
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    token_counts = [len(ids) for ids in tokenizer.encode_batch(sentences)]
+
+    chunks = []
+    current, counts = [], []  # sentences of the open chunk and their token counts
+
+    for sentence, n_tokens in zip(sentences, token_counts):
+        if n_tokens > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, counts = [], []
+            ids = tokenizer.encode_batch([sentence])[0]
+            step = max(max_tokens - overlap_tokens, 1)
+            for start in range(0, len(ids), step):
+                chunks.append(tokenizer.decode(ids[start:start + max_tokens]).strip())
+                if start + max_tokens >= len(ids):
+                    break
+            continue
+
+        if current and sum(counts) + n_tokens > max_tokens:
+            chunks.append(" ".join(current))
+            # Carry over whole trailing sentences that fit in the overlap budget
+            keep, kept_tokens = 0, 0
+            for prev_tokens in reversed(counts):
+                if kept_tokens + prev_tokens > overlap_tokens or kept_tokens + prev_tokens + n_tokens > max_tokens:
+                    break
+                keep += 1
+                kept_tokens += prev_tokens
+            current, counts = current[len(current) - keep:], counts[len(counts) - keep:]
+
+        current.append(sentence)
+        counts.append(n_tokens)
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def iter_token_chunks(doc, tokenizer, max_tokens=256, overlap_tokens=32):
+    """
+    Yields heading-aware chunks like iter_recursive_chunks, but sized in tokens and
+    cut on sentence boundaries. Each chunk's metadata also records its token_count.
+    """
+    chunks = iter_recursive_chunks(
+        doc, split_fn=lambda text: split_text_by_tokens(text, tokenizer, max_tokens, overlap_tokens)
+    )
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == 256:
+            yield from _with_token_counts(batch, tokenizer)
+            batch = []
+    yield from _with_token_counts(batch, tokenizer)
+
+
+def _with_token_counts(chunks, tokenizer):
+    for chunk, ids in zip(chunks, tokenizer.encode_batch([c["content"] for c in chunks])):
+        chunk["metadata"]["token_count"] = len(ids)
+        yield chunk
+
+
+def token_chunk_docx(input_path, output_path, tokenizer_spec, max_tokens=256, overlap_tokens=32):
+    """
+    Reads DOCX, performs token-budget chunking with sentence snapping, and saves JSONL.
+    """
+    print(f"Processing document: {input_path} ({tokenizer_spec}, {max_tokens} tokens, {overlap_tokens} overlap)")
+    tokenizer = Tokenizer(tokenizer_spec)
+    doc = Document(input_path)
+
+    total_tokens = 0
+
+    def counted(chunks):
+        nonlocal total_tokens
+        for chunk in chunks:
+            total_tokens += chunk["metadata"]["token_count"]
+            yield chunk
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    count = write_jsonl(counted(iter_token_chunks(doc, tokenizer, max_tokens, overlap_tokens)), output_path)
+
+    print(f"Saved {count} chunks ({total_tokens} tokens, {total_tokens / max(count, 1):.0f} per chunk) to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token-budget chunking of a DOCX file with sentence snapping.")
+    parser.add_argument("--input", default=INPUT_DOCX)
+    parser.add_argument("--output", default=OUTPUT_JSONL)
+    parser.add_argument("--model", choices=list(MODEL_TOKENIZERS), default="open_source",
+                        help="Pick the tokenizer and token budget of this embedding model")
+    parser.add_argument("--tokenizer", default=None, help="Override, e.g. tiktoken:cl100k_base or hf:<model>")
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    token_chunk_docx(args.input, args.output,
+                     args.tokenizer or MODEL_TOKENIZERS[args.model],
+                     max_tokens=args.max_tokens or MODEL_TOKEN_BUDGETS[args.model],
+                     overlap_tokens=args.overlap_tokens)
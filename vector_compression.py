@@ -0,0 +1,98 @@
+import os
+import re
+import glob
+import faiss
+import numpy as np
+from ann_indexes import add_vectors, default_pq_m, pq_nbits, TRAIN_SAMPLE_SIZE, SEED
+
+COMPRESSION_LEVELS = ["fp32", "fp16", "int8", "binary", "pq"]
+MATRYOSHKA_DIMS = [64, 128, 256, 512]
+
+
+def make_compressed_index(embeddings, level="fp32", m=None, ids=None):
+    """
+    Builds a flat (exhaustive) index that stores vectors at the given compression level.
+
+    Levels and their storage cost per vector:
+        fp32:   4 bytes per dimension (IndexFlatL2, the uncompressed baseline)
+        fp16:   2 bytes per dimension (IndexScalarQuantizer QT_fp16)
+        int8:   1 byte per dimension (IndexScalarQuantizer QT_8bit, trained per-dimension ranges)
+        binary: 1 bit per dimension (IndexLSH with sign thresholds, Hamming search)
+        pq:     m bytes (IndexPQ with m sub-quantizers)
+
+    Args:
+        embeddings (np.ndarray): A float32 array of shape (n_samples, dim)
+        level (str): One of COMPRESSION_LEVELS
+        m (int | None): PQ sub-quantizers, None for default_pq_m(dim)
+        ids (np.ndarray | None): int64 ids per row, see ann_indexes.make_index
+
+    Returns:
+        faiss.Index: The trained and populated index
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+
+    if level == "fp32":
+        index = faiss.IndexFlatL2(dim)
+    elif level == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif level == "int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif level == "binary":
+        # One sign bit per dimension, no random rotation; float queries are binarized the same way
+        index = faiss.IndexLSH(dim, dim, False, False)
+    elif level == "pq":
+        if m is None or dim % m != 0:
+            m = default_pq_m(dim)
+        index = faiss.IndexPQ(dim, m, pq_nbits(min(n, TRAIN_SAMPLE_SIZE)), faiss.METRIC_L2)
+    else:
+        raise ValueError(f"Unknown compression level: {level}. Choose from {COMPRESSION_LEVELS}")
+
+    if not index.is_trained:
+        sample = embeddings
+        if n > TRAIN_SAMPLE_SIZE:
+            sample = embeddings[np.random.default_rng(SEED).choice(n, TRAIN_SAMPLE_SIZE, replace=False)]
+        index.train(sample)
+    return add_vectors(index, embeddings, ids)
+
+
+def bytes_per_vector(index):
+    """Storage cost of one encoded vector in bytes, or None if the index type does not report it."""
+    try:
+        return int(index.sa_code_size())
+    except RuntimeError:
+        return None
+
+
+def compressed_index_path(path, level):
+    """'dir/openai.index' -> 'dir/openai.fp16.index'; fp32 keeps the original path."""
+    if level == "fp32":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{level}{ext}"
+
+
+def truncate_embeddings(embeddings, dim):
+    """
+    Matryoshka shortening: keeps the first dim components and rescales every row to unit length.
+
+    text-embedding-3-* and embed-v4.0 are trained so that prefixes of their vectors are
+    embeddings in their own right, so shorter variants need no new API calls.
+    """
+    truncated = np.array(embeddings[:, :dim], dtype="float32")
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.where(norms > 0, norms, 1)
+
+
+def truncated_index_path(path, dim):
+    """'dir/openai.index' -> 'dir/openai.d256.index'"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.d{dim}{ext}"
+
+
+def truncated_index_dims(path):
+    """Dimensions of the truncated variants of path found on disk, e.g. [64, 256] for openai.d64.index, openai.d256.index."""
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(root) + r"\.d(\d+)" + re.escape(ext) + "$")
+    matches = (pattern.match(p) for p in glob.glob(glob.escape(root) + ".d*" + ext))
+    return sorted(int(m.group(1)) for m in matches if m)